@@ -0,0 +1,175 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+
+def env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+def env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
+def env_list(name: str, default: list[str]) -> list[str]:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+# upstream http client
+HTTP2 = env_bool("HTTP2", True)
+HTTP_TIMEOUT = env_float("HTTP_TIMEOUT", 10)
+HTTP_CONNECT_TIMEOUT = env_float("HTTP_CONNECT_TIMEOUT", 5)
+HTTP_MAX_CONNECTIONS_PER_HOST = env_int("HTTP_MAX_CONNECTIONS_PER_HOST", 20)
+HTTP_MAX_KEEPALIVE_PER_HOST = env_int("HTTP_MAX_KEEPALIVE_PER_HOST", 10)
+HTTP_KEEPALIVE_EXPIRY = env_float("HTTP_KEEPALIVE_EXPIRY", 30)
+
+# overall budget of the upstream calls one route makes, a route out of
+# time answers 504 instead of waiting on every call's own timeout, the
+# slow budget is for routes making several calls (episodes, servers, schedule)
+ROUTE_DEADLINE = env_float("ROUTE_DEADLINE", 20)
+ROUTE_DEADLINE_SEARCH = env_float("ROUTE_DEADLINE_SEARCH", 10)
+ROUTE_DEADLINE_SLOW = env_float("ROUTE_DEADLINE_SLOW", 30)
+
+# hedged GETs, a second identical request once the first is slower than
+# the host's p95 latency over its last HTTP_HEDGE_SAMPLES responses
+HTTP_HEDGE = env_bool("HTTP_HEDGE", False)
+HTTP_HEDGE_SAMPLES = env_int("HTTP_HEDGE_SAMPLES", 200)
+HTTP_HEDGE_MIN_SAMPLES = env_int("HTTP_HEDGE_MIN_SAMPLES", 20)
+
+# circuit breaker per upstream host, see app/core/breaker.py
+BREAKER_WINDOW = env_int("BREAKER_WINDOW", 20)
+BREAKER_MIN_CALLS = env_int("BREAKER_MIN_CALLS", 10)
+BREAKER_ERROR_RATE = env_float("BREAKER_ERROR_RATE", 0.5)
+BREAKER_SLOW_CALL = env_float("BREAKER_SLOW_CALL", 10)
+BREAKER_PROBE_INTERVAL = env_int("BREAKER_PROBE_INTERVAL", 15)
+
+# html parsing, 0 workers parses inline on the event loop and resizes images
+# in a thread
+PARSER_POOL_SIZE = env_int("PARSER_POOL_SIZE", min(4, os.cpu_count() or 1))
+PARSER_MAX_PENDING = env_int("PARSER_MAX_PENDING", PARSER_POOL_SIZE * 8)
+
+# parser backend per source: "html.parser", "lxml" or "lexbor" (selectolax,
+# listing pages only, detail pages fall back to lxml)
+PARSER_DEFAULT = os.getenv("PARSER_DEFAULT", "html.parser")
+PARSER_OTAKUDESU = os.getenv("PARSER_OTAKUDESU", PARSER_DEFAULT)
+PARSER_SAMEHADAKU = os.getenv("PARSER_SAMEHADAKU", PARSER_DEFAULT)
+PARSER_KOMIKU = os.getenv("PARSER_KOMIKU", PARSER_DEFAULT)
+PARSER_ANIMENEWSNETWORK = os.getenv("PARSER_ANIMENEWSNETWORK", PARSER_DEFAULT)
+
+# samehadaku /schedule, days fetched at the same time
+SCHEDULE_CONCURRENCY = env_int("SCHEDULE_CONCURRENCY", 4)
+
+# otakudesu admin-ajax nonce, shared by every worker through the cache backend
+OTAKUDESU_NONCE_TTL = env_int("OTAKUDESU_NONCE_TTL", 3600)
+OTAKUDESU_NONCE_REFRESH_AHEAD = env_int("OTAKUDESU_NONCE_REFRESH_AHEAD", 300)
+
+# cached routes are served stale for this long past their expiry while they
+# are refreshed in the background, or while the upstream is failing
+CACHE_STALE_TTL = env_int("CACHE_STALE_TTL", 86400)
+
+# cache misses for the same key are fetched once, other workers wait on a
+# redis lock held for at most SINGLEFLIGHT_LOCK_TTL seconds
+SINGLEFLIGHT_LOCK_TTL = env_float("SINGLEFLIGHT_LOCK_TTL", 30)
+SINGLEFLIGHT_WAIT = env_float("SINGLEFLIGHT_WAIT", 30)
+SINGLEFLIGHT_POLL = env_float("SINGLEFLIGHT_POLL", 0.1)
+
+# in-process cache in front of redis, 0 items disables it
+CACHE_LOCAL_MAX_ITEMS = env_int("CACHE_LOCAL_MAX_ITEMS", 1024)
+CACHE_LOCAL_MAX_BYTES = env_int("CACHE_LOCAL_MAX_BYTES", 64 * 1024 * 1024)
+CACHE_LOCAL_TTL = env_float("CACHE_LOCAL_TTL", 10)
+CACHE_INVALIDATION_CHANNEL = os.getenv(
+    "CACHE_INVALIDATION_CHANNEL", "fastapi-cache:invalidate"
+)
+
+# search results, cached per normalized query, the upstream answer of a
+# shorter query with fewer than SEARCH_PREFIX_MAX_RESULTS results answers
+# longer ones
+SEARCH_CACHE_TTL = env_int("SEARCH_CACHE_TTL", 600)
+SEARCH_CACHE_STALE = env_int("SEARCH_CACHE_STALE", 3600)
+SEARCH_PREFIX_MIN_LENGTH = env_int("SEARCH_PREFIX_MIN_LENGTH", 3)
+SEARCH_PREFIX_MAX_RESULTS = env_int("SEARCH_PREFIX_MAX_RESULTS", 10)
+
+# fuzzy title index over the catalog, titles sharing SEARCH_INDEX_MIN_SCORE
+# of the query trigrams are candidates and match when every query word is
+# close to one of their words, see app/core/index.py
+SEARCH_INDEX_MIN_SCORE = env_float("SEARCH_INDEX_MIN_SCORE", 0.5)
+SEARCH_INDEX_WORD_SCORE = env_float("SEARCH_INDEX_WORD_SCORE", 0.6)
+SEARCH_INDEX_LIMIT = env_int("SEARCH_INDEX_LIMIT", 20)
+SEARCH_INDEX_REFRESH = env_int("SEARCH_INDEX_REFRESH", 60)
+
+# the unified /search waits this long for every source before answering
+# with what it has
+SEARCH_DEADLINE = env_float("SEARCH_DEADLINE", 5)
+
+# ndjson listing streams, pages fetched ahead and the most pages one stream
+# walks
+STREAM_PREFETCH_PAGES = env_int("STREAM_PREFETCH_PAGES", 3)
+STREAM_MAX_PAGES = env_int("STREAM_MAX_PAGES", 100)
+
+# batch detail endpoints, ids per request and upstream loads at a time
+BATCH_MAX_IDS = env_int("BATCH_MAX_IDS", 50)
+BATCH_CONCURRENCY = env_int("BATCH_CONCURRENCY", 5)
+
+# cache values, compression is "auto" (zstd when zstandard is installed,
+# zlib otherwise), "zstd", "zlib" or "none"
+CACHE_COMPRESSION = os.getenv("CACHE_COMPRESSION", "auto")
+CACHE_COMPRESS_MIN_BYTES = env_int("CACHE_COMPRESS_MIN_BYTES", 2048)
+CACHE_COMPRESS_LEVEL = env_int("CACHE_COMPRESS_LEVEL", 3)
+
+# cache backend, "redis" or "memory" (single process, no redis needed)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "redis")
+CACHE_PREFIX = os.getenv("CACHE_PREFIX", "fastapi-cache")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost")
+REDIS_MAX_CONNECTIONS = env_int("REDIS_MAX_CONNECTIONS", 50)
+REDIS_SOCKET_TIMEOUT = env_float("REDIS_SOCKET_TIMEOUT", 2)
+REDIS_CONNECT_TIMEOUT = env_float("REDIS_CONNECT_TIMEOUT", 2)
+REDIS_HEALTH_CHECK_INTERVAL = env_int("REDIS_HEALTH_CHECK_INTERVAL", 30)
+
+# keys unlinked per round trip when invalidating by pattern
+CACHE_DELETE_BATCH = env_int("CACHE_DELETE_BATCH", 500)
+
+# cache warmer for the hot routes, in the app lifespan when enabled or as
+# its own process with python -m app.warmer
+WARMER_ENABLED = env_bool("WARMER_ENABLED", False)
+WARM_INTERVAL = env_float("WARM_INTERVAL", 60)
+WARM_JITTER = env_float("WARM_JITTER", 10)
+WARM_REFRESH_AHEAD = env_int("WARM_REFRESH_AHEAD", 300)
+WARM_CONCURRENCY_PER_HOST = env_int("WARM_CONCURRENCY_PER_HOST", 2)
+WARM_ONGOING_PAGES = env_int("WARM_ONGOING_PAGES", 3)
+
+# local sqlite catalog of crawled listings, an empty path disables it
+CATALOG_PATH = os.getenv("CATALOG_PATH", "catalog.sqlite3")
+CATALOG_MAX_AGE = env_int("CATALOG_MAX_AGE", 6 * 3600)
+CATALOG_CRAWLER_ENABLED = env_bool("CATALOG_CRAWLER_ENABLED", False)
+CATALOG_CRAWL_INTERVAL = env_int("CATALOG_CRAWL_INTERVAL", 3600)
+CATALOG_RECRAWL_AFTER = env_int("CATALOG_RECRAWL_AFTER", 3 * 3600)
+CATALOG_STOP_UNCHANGED = env_int("CATALOG_STOP_UNCHANGED", 2)
+CATALOG_MAX_PAGES = env_int("CATALOG_MAX_PAGES", 50)
+CATALOG_CONCURRENCY = env_int("CATALOG_CONCURRENCY", 2)
+
+# image proxy, only hosts under IMAGE_HOSTS (or their subdomains) are
+# fetched, images are kept in IMAGE_CACHE_DIR up to IMAGE_CACHE_MAX_BYTES
+# with the least recently served removed first
+IMAGE_HOSTS = env_list(
+    "IMAGE_HOSTS",
+    ["otakudesu.cloud", "samehadaku.mba", "komiku.id", "animenewsnetwork.com"],
+)
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "image-cache")
+IMAGE_CACHE_MAX_BYTES = env_int("IMAGE_CACHE_MAX_BYTES", 1024 * 1024 * 1024)
+IMAGE_CACHE_TTL = env_int("IMAGE_CACHE_TTL", 7 * 86400)
+IMAGE_MAX_BYTES = env_int("IMAGE_MAX_BYTES", 10 * 1024 * 1024)
+IMAGE_MAX_AGE = env_int("IMAGE_MAX_AGE", 86400)
+IMAGE_MAX_REDIRECTS = env_int("IMAGE_MAX_REDIRECTS", 3)
+
+# thumbnails rendered by the image proxy, needs Pillow
+IMAGE_MAX_WIDTH = env_int("IMAGE_MAX_WIDTH", 2048)
+IMAGE_RESIZE_CONCURRENCY = env_int("IMAGE_RESIZE_CONCURRENCY", 2)
@@ -0,0 +1,286 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from fastapi_cache.backends.redis import RedisBackend
+from fastapi_cache.types import Backend
+from redis import asyncio as aioredis
+
+from app import config
+from app.core.cache import route_key
+from app.core.coder import CompactCoder
+
+logger = logging.getLogger(__name__)
+
+backend: Backend | None = None
+
+
+class TieredBackend(Backend):
+    """Bounded in-process LRU in front of redis.
+
+    Entries are kept locally for at most `local_ttl` seconds and never past
+    their redis expiry. Writes and clears are published on `channel` so the
+    other workers drop their local copy and read the new value from redis.
+    """
+
+    def __init__(
+        self,
+        redis,
+        max_items: int = config.CACHE_LOCAL_MAX_ITEMS,
+        max_bytes: int = config.CACHE_LOCAL_MAX_BYTES,
+        local_ttl: float = config.CACHE_LOCAL_TTL,
+        channel: str = config.CACHE_INVALIDATION_CHANNEL,
+    ):
+        self.redis = redis
+        self.remote = RedisBackend(redis)
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.local_ttl = local_ttl
+        self.channel = channel
+        self.id = uuid.uuid4().hex
+        self.size = 0
+        # key -> (value, redis expiry, local expiry), least recently used first
+        self.entries: OrderedDict[str, tuple[bytes, float, float]] = OrderedDict()
+        self.listener: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self.listener = asyncio.create_task(self.listen())
+
+    async def stop(self) -> None:
+        if self.listener is not None:
+            self.listener.cancel()
+            self.listener = None
+
+    async def get_with_ttl(self, key: str) -> tuple[int, bytes | None]:
+        entry = self.lookup(key)
+        if entry is not None:
+            value, expires_at, _ = entry
+            return max(int(expires_at - time.monotonic()), 0), value
+
+        ttl, value = await self.remote.get_with_ttl(key)
+        if value is not None and ttl > 0:
+            self.store(key, value, ttl)
+        return ttl, value
+
+    async def get(self, key: str) -> bytes | None:
+        return (await self.get_with_ttl(key))[1]
+
+    async def set(self, key: str, value: bytes, expire: int | None = None) -> None:
+        await self.remote.set(key, value, expire)
+        if expire:
+            self.store(key, value, expire)
+        else:
+            self.drop(key)
+        await self.publish({"key": key})
+
+    async def clear(self, namespace: str | None = None, key: str | None = None) -> int:
+        cleared = await self.remote.clear(namespace, key)
+        self.invalidate(namespace, key)
+        await self.publish({"namespace": namespace, "key": key})
+        return cleared
+
+    async def delete_matching(self, pattern: str) -> int:
+        deleted = await unlink_matching(self.redis, pattern)
+        self.forget(pattern)
+        await self.publish({"pattern": pattern})
+        return deleted
+
+    def lookup(self, key: str) -> tuple[bytes, float, float] | None:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[2] <= time.monotonic():
+            self.drop(key)
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def store(self, key: str, value: bytes, ttl: int) -> None:
+        if self.max_items <= 0 or len(value) > self.max_bytes:
+            self.drop(key)
+            return
+
+        now = time.monotonic()
+        self.drop(key)
+        self.entries[key] = (value, now + ttl, now + min(ttl, self.local_ttl))
+        self.size += len(value)
+
+        while len(self.entries) > self.max_items or self.size > self.max_bytes:
+            _, (evicted, _, _) = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def drop(self, key: str) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[0])
+
+    def invalidate(self, namespace: str | None, key: str | None) -> None:
+        if namespace:
+            for cached in [k for k in self.entries if k.startswith(namespace + ":")]:
+                self.drop(cached)
+        elif key:
+            self.drop(key)
+
+    def forget(self, pattern: str) -> None:
+        for cached in [k for k in self.entries if fnmatchcase(k, pattern)]:
+            self.drop(cached)
+
+    async def publish(self, message: dict) -> None:
+        try:
+            await self.redis.publish(
+                self.channel, json.dumps({"from": self.id, **message})
+            )
+        except Exception:
+            logger.warning("Error publishing cache invalidation", exc_info=True)
+
+    async def listen(self) -> None:
+        # reconnects after redis errors, local entries expire on their own
+        # within local_ttl while the subscription is down
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    while True:
+                        # short reads, a blocking one would trip socket_timeout
+                        message = await pubsub.get_message(
+                            ignore_subscribe_messages=True, timeout=1.0
+                        )
+                        if message is None:
+                            continue
+                        data = json.loads(message["data"])
+                        if data["from"] == self.id:
+                            continue
+                        if "pattern" in data:
+                            self.forget(data["pattern"])
+                        else:
+                            self.invalidate(data.get("namespace"), data.get("key"))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("Cache invalidation listener failed", exc_info=True)
+                self.entries.clear()
+                self.size = 0
+                await asyncio.sleep(1)
+
+    async def get_many_with_ttl(
+        self, keys: list[str]
+    ) -> list[tuple[int, bytes | None]]:
+        entries = {}
+        for key in keys:
+            entry = self.lookup(key)
+            if entry is not None:
+                entries[key] = (max(int(entry[1] - time.monotonic()), 0), entry[0])
+
+        missing = [key for key in keys if key not in entries]
+        for key, (ttl, value) in zip(
+            missing, await pipelined_get_with_ttl(self.redis, missing)
+        ):
+            if value is not None and ttl > 0:
+                self.store(key, value, ttl)
+            entries[key] = (ttl, value)
+
+        return [entries[key] for key in keys]
+
+
+async def pipelined_get_with_ttl(
+    redis, keys: list[str]
+) -> list[tuple[int, bytes | None]]:
+    # TTL and GET of every key in one round trip
+    if not keys:
+        return []
+    async with redis.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.ttl(key)
+            pipe.get(key)
+        replies = await pipe.execute()
+    return list(zip(replies[::2], replies[1::2]))
+
+
+async def get_many_with_ttl(keys: list[str]) -> list[tuple[int, bytes | None]]:
+    """(ttl, value) of every key, one redis round trip for all of them."""
+    backend = FastAPICache.get_backend()
+
+    if isinstance(backend, TieredBackend):
+        return await backend.get_many_with_ttl(keys)
+    if isinstance(backend, RedisBackend):
+        return await pipelined_get_with_ttl(backend.redis, keys)
+    return [await backend.get_with_ttl(key) for key in keys]
+
+
+async def unlink_matching(redis, pattern: str) -> int:
+    # SCAN in batches and UNLINK each one, redis frees the values in the
+    # background instead of blocking like KEYS + DEL
+    deleted = 0
+    batch = []
+    async for key in redis.scan_iter(match=pattern, count=config.CACHE_DELETE_BATCH):
+        batch.append(key)
+        if len(batch) >= config.CACHE_DELETE_BATCH:
+            deleted += await redis.unlink(*batch)
+            batch = []
+    if batch:
+        deleted += await redis.unlink(*batch)
+    return deleted
+
+
+async def delete_matching(pattern: str) -> int:
+    """Delete every cache key matching a redis glob pattern."""
+    backend = FastAPICache.get_backend()
+
+    if isinstance(backend, TieredBackend):
+        return await backend.delete_matching(pattern)
+    if isinstance(backend, RedisBackend):
+        return await unlink_matching(backend.redis, pattern)
+    if isinstance(backend, InMemoryBackend):
+        keys = [key for key in backend._store if fnmatchcase(key, pattern)]
+        for key in keys:
+            del backend._store[key]
+        return len(keys)
+
+    raise NotImplementedError(f"Can not delete by pattern on {type(backend)}")
+
+
+def redis_client():
+    return aioredis.from_url(
+        config.REDIS_URL,
+        max_connections=config.REDIS_MAX_CONNECTIONS,
+        socket_timeout=config.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=config.REDIS_CONNECT_TIMEOUT,
+        health_check_interval=config.REDIS_HEALTH_CHECK_INTERVAL,
+    )
+
+
+async def startup() -> None:
+    global backend
+
+    if config.CACHE_BACKEND == "memory":
+        backend = InMemoryBackend()
+    elif config.CACHE_BACKEND == "redis":
+        redis = redis_client()
+        if config.CACHE_LOCAL_MAX_ITEMS > 0:
+            backend = TieredBackend(redis)
+            await backend.start()
+        else:
+            backend = RedisBackend(redis)
+    else:
+        raise ValueError(f"Unknown CACHE_BACKEND {config.CACHE_BACKEND!r}")
+
+    FastAPICache.init(
+        backend, prefix=config.CACHE_PREFIX, coder=CompactCoder, key_builder=route_key
+    )
+
+
+async def shutdown() -> None:
+    global backend
+
+    if isinstance(backend, TieredBackend):
+        await backend.stop()
+    if isinstance(backend, RedisBackend | TieredBackend):
+        await backend.redis.aclose()
+    backend = None
+    FastAPICache.reset()
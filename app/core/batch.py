@@ -0,0 +1,60 @@
+"""Detail routes for many ids in one call.
+
+Ids are deduplicated, every cached one comes out of a single multi-get
+(stale ones are refreshed in the background like a normal request would)
+and only the misses go through the route, at most BATCH_CONCURRENCY at a
+time. A failing id gets its own error instead of failing the batch.
+"""
+
+import asyncio
+import logging
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi_cache import FastAPICache
+
+from app import config
+from app.core import backends
+from app.core.cache import readable
+
+logger = logging.getLogger(__name__)
+
+
+async def details(route, ids: list[str]) -> dict[str, dict]:
+    """id -> {"result": ...} or {"error": ..., "status_code": ...}."""
+    ids = list(dict.fromkeys(ids))
+    results = await cached(route, ids)
+
+    limit = asyncio.Semaphore(config.BATCH_CONCURRENCY)
+
+    async def fetch(id: str) -> None:
+        async with limit:
+            try:
+                results[id] = {"result": jsonable_encoder(await route(id=id))}
+            except HTTPException as error:
+                results[id] = {"error": error.detail, "status_code": error.status_code}
+            except Exception:
+                logger.warning("Error loading %s in a batch", id, exc_info=True)
+                results[id] = {"error": "Internal Server Error", "status_code": 500}
+
+    await asyncio.gather(*(fetch(id) for id in ids if id not in results))
+    return {id: results[id] for id in ids}
+
+
+async def cached(route, ids: list[str]) -> dict[str, dict]:
+    if not FastAPICache.get_enable():
+        return {}
+
+    coder = FastAPICache.get_coder()
+    try:
+        entries = await backends.get_many_with_ttl([route.key(id=id) for id in ids])
+    except Exception:
+        logger.warning("Error reading cached batch", exc_info=True)
+        return {}
+
+    results = {}
+    for id, (ttl, data) in zip(ids, entries):
+        if readable(coder, data):
+            results[id] = {"result": coder.decode(data)}
+            route.refresh(ttl, id=id)
+    return results
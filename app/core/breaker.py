@@ -0,0 +1,110 @@
+"""Circuit breaker per upstream host.
+
+The outcomes of the last BREAKER_WINDOW calls are kept, a call counts as
+failed when it errors, answers 5xx or takes longer than BREAKER_SLOW_CALL
+seconds. Once BREAKER_ERROR_RATE of at least BREAKER_MIN_CALLS calls failed
+the circuit opens: calls fail at once with 503 and cached routes keep
+serving their stale entries, while a background task probes the host every
+BREAKER_PROBE_INTERVAL seconds and closes the circuit when it answers again.
+A 5xx answer is raised as a 502 instead of being parsed, cached routes serve
+their stale entries on it too.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+
+from fastapi import HTTPException
+
+from app import config
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpen(HTTPException):
+    def __init__(self, host: str, retry_after: int):
+        super().__init__(
+            status_code=503,
+            detail=f"{host} is unavailable",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+class UpstreamError(HTTPException):
+    def __init__(self, host: str, status_code: int):
+        super().__init__(status_code=502, detail=f"{host} answered {status_code}")
+
+
+class Breaker:
+    def __init__(self, host: str, probe: Callable[[], Awaitable[bool]]):
+        self.host = host
+        self.probe = probe
+        self.calls: deque[bool] = deque(maxlen=config.BREAKER_WINDOW)
+        self.opened_at: float | None = None
+        self.recovery: asyncio.Task | None = None
+
+    @property
+    def state(self) -> str:
+        return "closed" if self.opened_at is None else "open"
+
+    def error_rate(self) -> float:
+        return self.calls.count(False) / len(self.calls) if self.calls else 0.0
+
+    def check(self) -> None:
+        """Raise CircuitOpen while the host is considered down."""
+        if self.opened_at is not None:
+            raise CircuitOpen(self.host, config.BREAKER_PROBE_INTERVAL)
+
+    def record(self, ok: bool, elapsed: float) -> None:
+        self.calls.append(ok and elapsed < config.BREAKER_SLOW_CALL)
+        if (
+            self.opened_at is None
+            and len(self.calls) >= config.BREAKER_MIN_CALLS
+            and self.error_rate() >= config.BREAKER_ERROR_RATE
+        ):
+            self.open()
+
+    def open(self) -> None:
+        logger.warning(
+            "Opening the circuit of %s, %.0f%% of the last %d calls failed",
+            self.host,
+            self.error_rate() * 100,
+            len(self.calls),
+        )
+        self.opened_at = time.monotonic()
+        self.recovery = asyncio.create_task(self.recover())
+
+    def close(self) -> None:
+        logger.info("Closing the circuit of %s", self.host)
+        self.opened_at = None
+        self.recovery = None
+        self.calls.clear()
+
+    async def recover(self) -> None:
+        while True:
+            await asyncio.sleep(config.BREAKER_PROBE_INTERVAL)
+            try:
+                if await self.probe():
+                    break
+            except Exception:
+                logger.debug("Probe of %s failed", self.host, exc_info=True)
+        self.close()
+
+    def stop(self) -> None:
+        if self.recovery is not None:
+            self.recovery.cancel()
+            self.recovery = None
+
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            "error_rate": round(self.error_rate(), 2),
+            "calls": len(self.calls),
+            "open_for": (
+                None
+                if self.opened_at is None
+                else round(time.monotonic() - self.opened_at, 1)
+            ),
+        }
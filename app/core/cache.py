@@ -0,0 +1,239 @@
+import asyncio
+import hashlib
+import logging
+from functools import partial, wraps
+from inspect import Parameter, Signature
+from urllib.parse import quote
+
+from fastapi import HTTPException
+from fastapi.dependencies.utils import get_typed_signature
+from fastapi_cache import FastAPICache
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.status import HTTP_304_NOT_MODIFIED
+
+from app import config
+from app.core import singleflight
+from app.core.breaker import CircuitOpen, UpstreamError
+
+logger = logging.getLogger(__name__)
+
+# background refreshes in flight in this process, keyed by cache key
+refreshing: dict[str, asyncio.Task] = {}
+
+injected_request = Parameter(
+    "__cache_request", Parameter.KEYWORD_ONLY, annotation=Request
+)
+injected_response = Parameter(
+    "__cache_response", Parameter.KEYWORD_ONLY, annotation=Response
+)
+
+
+def cache(
+    expire: int = 3600,
+    stale: int | None = None,
+    namespace: str = "",
+    key_builder=None,
+):
+    """Cache a route with stale-while-revalidate.
+
+    An entry is fresh for `expire` seconds and is then served stale for up to
+    `stale` more seconds while it is refreshed in the background. A failed
+    refresh keeps the stale entry (stale-if-error), only after
+    `expire + stale` seconds does a request wait for the upstream again.
+    """
+    stale = config.CACHE_STALE_TTL if stale is None else stale
+
+    def wrapper(func):
+        signature = get_typed_signature(func)
+
+        def key_for(args, kwargs, request=None, response=None) -> str:
+            return (key_builder or route_key)(
+                func,
+                f"{FastAPICache.get_prefix()}:{namespace}",
+                request=request,
+                response=response,
+                args=args,
+                kwargs=kwargs,
+            )
+
+        async def load(key, args, kwargs):
+            result = await func(*args, **kwargs)
+            data = FastAPICache.get_coder().encode(result)
+            try:
+                await FastAPICache.get_backend().set(key, data, expire + stale)
+            except Exception:
+                logger.warning("Error setting cache key %s", key, exc_info=True)
+            return result, data
+
+        @wraps(func)
+        async def inner(*args, **kwargs):
+            request: Request | None = kwargs.pop(injected_request.name, None)
+            response: Response | None = kwargs.pop(injected_response.name, None)
+
+            if not FastAPICache.get_enable() or (
+                request is not None
+                and (
+                    request.method != "GET"
+                    or request.headers.get("Cache-Control") == "no-store"
+                )
+            ):
+                return await func(*args, **kwargs)
+
+            backend = FastAPICache.get_backend()
+            coder = FastAPICache.get_coder()
+            key = key_for(args, kwargs, request, response)
+            fetch = partial(load, key, args, kwargs)
+
+            async def lookup():
+                # filled by the worker holding the single-flight lock
+                cached = await backend.get(key)
+                return None if not readable(coder, cached) else (None, cached)
+
+            try:
+                ttl, cached = await backend.get_with_ttl(key)
+            except Exception:
+                logger.warning("Error reading cache key %s", key, exc_info=True)
+                ttl, cached = 0, None
+
+            if not readable(coder, cached):
+                cached = None
+
+            no_cache = request is not None and (
+                request.headers.get("Cache-Control") == "no-cache"
+            )
+
+            result = None
+            if cached is None:
+                status, (result, data) = "MISS", await singleflight.do(
+                    key, fetch, lookup
+                )
+            elif no_cache:
+                try:
+                    status, (result, data) = "MISS", await fetch()
+                except (CircuitOpen, UpstreamError):
+                    status, data = "STALE", cached
+                except HTTPException:
+                    raise
+                except Exception:
+                    logger.warning("Error revalidating %s", key, exc_info=True)
+                    status, data = "STALE", cached
+            elif ttl > stale:
+                status, data = "HIT", cached
+            else:
+                status, data = "STALE", cached
+                revalidate(key, fetch)
+
+            if response is not None:
+                tag = etag(coder, data)
+                max_age = expire if status == "MISS" else max(ttl - stale, 0)
+                response.headers.update(
+                    {
+                        "Cache-Control": f"max-age={max_age}",
+                        "ETag": tag,
+                        FastAPICache.get_cache_status_header(): status,
+                    }
+                )
+                # answered straight from the stored tag, the value is not
+                # decoded or serialized again
+                if request is not None and not_modified(request, tag):
+                    response.status_code = HTTP_304_NOT_MODIFIED
+                    return response
+
+            return coder.decode(data) if result is None else result
+
+        async def warm(*args, ahead: int = 0, **kwargs) -> bool:
+            """Reload the entry unless it stays fresh for more than `ahead`
+            seconds, False when it was fresh or another worker is loading it.
+            """
+            if not FastAPICache.get_enable():
+                return False
+
+            key = key_for(args, kwargs)
+            ttl, cached = await FastAPICache.get_backend().get_with_ttl(key)
+            if readable(FastAPICache.get_coder(), cached) and ttl - stale > ahead:
+                return False
+
+            return (
+                await singleflight.do(key, partial(load, key, args, kwargs)) is not None
+            )
+
+        def key(*args, **kwargs) -> str:
+            return key_for(args, kwargs)
+
+        def refresh(ttl: int, *args, **kwargs) -> None:
+            """Refresh an entry read elsewhere with `ttl` seconds left in the
+            background once it is stale."""
+            if ttl <= stale:
+                key = key_for(args, kwargs)
+                revalidate(key, partial(load, key, args, kwargs))
+
+        inner.warm = warm
+        inner.key = key
+        inner.refresh = refresh
+        inner.__signature__ = inject(signature)
+        return inner
+
+    return wrapper
+
+
+def route_key(
+    func, namespace: str = "", *, request=None, response=None, args=(), kwargs=None
+) -> str:
+    # prefix:source:route:value:..., e.g. fastapi-cache:otakudesu:anime:solo,
+    # values are quoted so ":" and glob characters never appear in them
+    if namespace.endswith(":"):
+        namespace += f"{func.__module__.rsplit('.', 1)[-1]}:{func.__name__}"
+    values = [*args, *(kwargs or {}).values()]
+    return ":".join([namespace, *(quote(str(value), safe="") for value in values)])
+
+
+def readable(coder, data: bytes | None) -> bool:
+    # values written by a newer release are a miss, not an error
+    supports = getattr(coder, "supports", None)
+    return data is not None and (supports is None or supports(data))
+
+
+def etag(coder, data: bytes) -> str:
+    # strong and the same in every worker, CompactCoder stores it with the
+    # value so it is not hashed per request
+    stored = getattr(coder, "etag", None)
+    if stored is not None:
+        return stored(data)
+    return f'"{hashlib.blake2b(data, digest_size=16).hexdigest()}"'
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match matches `etag`, compared weakly
+    as RFC 9110 asks for If-None-Match."""
+    value = request.headers.get("if-none-match")
+    if value is None:
+        return False
+    if value.strip() == "*":
+        return True
+    tags = (tag.strip().removeprefix("W/") for tag in value.split(","))
+    return etag.removeprefix("W/") in tags
+
+
+def inject(signature: Signature) -> Signature:
+    parameters = list(signature.parameters.values())
+    return signature.replace(
+        parameters=[*parameters, injected_request, injected_response]
+    )
+
+
+def revalidate(key: str, load) -> None:
+    # one refresh per key at a time, skipped when another worker is already
+    # refreshing it, the stale entry is kept when it fails
+    if key in refreshing:
+        return
+
+    async def refresh():
+        try:
+            await singleflight.do(key, load)
+        except Exception:
+            logger.warning("Error refreshing stale cache key %s", key, exc_info=True)
+        finally:
+            refreshing.pop(key, None)
+
+    refreshing[key] = asyncio.create_task(refresh())
@@ -0,0 +1,259 @@
+"""Local copy of the listings the crawler has walked.
+
+Titles are stored once per source with the json the scrapers returned for
+them, listings ("genre:action", "recent") remember which titles each page
+had and when it was crawled. Listing routes answer from here while the page
+is younger than CATALOG_MAX_AGE and fall back to the upstream otherwise.
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from app import config
+
+connection: sqlite3.Connection | None = None
+lock = threading.Lock()
+
+schema = """
+CREATE TABLE IF NOT EXISTS titles (
+    source TEXT NOT NULL,
+    id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    image TEXT NOT NULL,
+    data TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    japanese_title TEXT,
+    PRIMARY KEY (source, id)
+);
+CREATE INDEX IF NOT EXISTS titles_updated_at ON titles (updated_at);
+CREATE TABLE IF NOT EXISTS listings (
+    source TEXT NOT NULL,
+    listing TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    id TEXT NOT NULL,
+    PRIMARY KEY (source, listing, page, position)
+);
+CREATE INDEX IF NOT EXISTS listings_title ON listings (source, id);
+CREATE TABLE IF NOT EXISTS pages (
+    source TEXT NOT NULL,
+    listing TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    has_next_page INTEGER NOT NULL,
+    crawled_at REAL NOT NULL,
+    PRIMARY KEY (source, listing, page)
+);
+"""
+
+
+async def startup() -> None:
+    global connection
+    if not config.CATALOG_PATH:
+        return
+
+    connection = sqlite3.connect(config.CATALOG_PATH, check_same_thread=False)
+    connection.row_factory = sqlite3.Row
+    # readers in every worker while the crawler writes
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(schema)
+
+    # catalogs created before titles had a japanese title
+    columns = {row["name"] for row in connection.execute("PRAGMA table_info(titles)")}
+    if "japanese_title" not in columns:
+        connection.execute("ALTER TABLE titles ADD COLUMN japanese_title TEXT")
+
+
+async def shutdown() -> None:
+    global connection
+    if connection is not None:
+        connection.close()
+        connection = None
+
+
+def run(function, *args):
+    def locked():
+        with lock:
+            return function(connection, *args)
+
+    return asyncio.to_thread(locked)
+
+
+async def save(
+    source: str, listing: str, page: int, items: list[dict], has_next_page: bool
+) -> int:
+    """Store one crawled listing page, returns how many rows changed."""
+    if connection is None:
+        return 0
+    return await run(save_page, source, listing, page, items, has_next_page)
+
+
+def save_page(db, source, listing, page, items, has_next_page) -> int:
+    now = time.time()
+    changed = 0
+
+    with db:
+        for item in items:
+            data = json.dumps(item, sort_keys=True, ensure_ascii=False)
+            digest = hashlib.sha1(data.encode()).hexdigest()
+            # only rows whose scraped data differs are rewritten
+            changed += db.execute(
+                "INSERT INTO titles (source, id, title, image, data, hash, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (source, id) DO UPDATE SET title = excluded.title,"
+                " image = excluded.image, data = excluded.data,"
+                " hash = excluded.hash, updated_at = excluded.updated_at"
+                " WHERE titles.hash != excluded.hash",
+                (source, item["id"], item["title"], item["image"], data, digest, now),
+            ).rowcount
+
+        ids = [item["id"] for item in items]
+        stored = [
+            row["id"]
+            for row in db.execute(
+                "SELECT id FROM listings WHERE source = ? AND listing = ? AND page = ?"
+                " ORDER BY position",
+                (source, listing, page),
+            )
+        ]
+        if stored != ids:
+            db.execute(
+                "DELETE FROM listings WHERE source = ? AND listing = ? AND page = ?",
+                (source, listing, page),
+            )
+            db.executemany(
+                "INSERT INTO listings VALUES (?, ?, ?, ?, ?)",
+                [(source, listing, page, i, id) for i, id in enumerate(ids)],
+            )
+            changed += 1
+
+        db.execute(
+            "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)",
+            (source, listing, page, has_next_page, now),
+        )
+
+    return changed
+
+
+async def save_detail(source: str, anime: dict) -> None:
+    """Remember the japanese title of a scraped detail page for search."""
+    if connection is None:
+        return
+    await run(save_japanese_title, source, anime)
+
+
+def save_japanese_title(db, source, anime):
+    item = {
+        "id": anime["id"],
+        "title": anime["title"],
+        "episodes": None,
+        "image": anime["image"],
+    }
+    data = json.dumps(item, sort_keys=True, ensure_ascii=False)
+
+    with db:
+        # listing rows keep their data, only the japanese title is added
+        db.execute(
+            "INSERT INTO titles VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT (source, id) DO UPDATE SET"
+            " japanese_title = excluded.japanese_title,"
+            " updated_at = excluded.updated_at"
+            " WHERE titles.japanese_title IS NOT excluded.japanese_title",
+            (
+                source,
+                item["id"],
+                item["title"],
+                item["image"],
+                data,
+                hashlib.sha1(data.encode()).hexdigest(),
+                time.time(),
+                anime["japanese_title"] or None,
+            ),
+        )
+
+
+async def titles_since(updated_at: float) -> list[dict]:
+    """Titles added or changed since updated_at, oldest first."""
+    if connection is None:
+        return []
+    return await run(select_titles_since, updated_at)
+
+
+def select_titles_since(db, updated_at):
+    return [
+        dict(row)
+        for row in db.execute(
+            "SELECT source, id, title, japanese_title, data, updated_at FROM titles"
+            " WHERE updated_at >= ? ORDER BY updated_at",
+            (updated_at,),
+        )
+    ]
+
+
+async def crawled(source: str, listing: str, page: int) -> tuple[float, bool] | None:
+    """Age in seconds and has_next_page of a crawled page."""
+    if connection is None:
+        return None
+    return await run(crawled_page, source, listing, page)
+
+
+def crawled_page(db, source, listing, page):
+    row = db.execute(
+        "SELECT has_next_page, crawled_at FROM pages"
+        " WHERE source = ? AND listing = ? AND page = ?",
+        (source, listing, page),
+    ).fetchone()
+    if row is None:
+        return None
+    return time.time() - row["crawled_at"], bool(row["has_next_page"])
+
+
+async def listing(
+    source: str, listing: str, page: int, max_age: int | None = None
+) -> tuple[list[dict], bool] | None:
+    """Titles of a listing page and whether it has a next page, None when the
+    page was never crawled or is older than `max_age` (CATALOG_MAX_AGE)."""
+    if connection is None:
+        return None
+    max_age = config.CATALOG_MAX_AGE if max_age is None else max_age
+    return await run(listing_page, source, listing, page, max_age)
+
+
+def listing_page(db, source, listing, page, max_age):
+    row = db.execute(
+        "SELECT has_next_page, crawled_at FROM pages"
+        " WHERE source = ? AND listing = ? AND page = ?",
+        (source, listing, page),
+    ).fetchone()
+    if row is None or time.time() - row["crawled_at"] > max_age:
+        return None
+
+    items = [
+        json.loads(title["data"])
+        for title in db.execute(
+            "SELECT titles.data FROM listings JOIN titles"
+            " ON titles.source = listings.source AND titles.id = listings.id"
+            " WHERE listings.source = ? AND listings.listing = ? AND listings.page = ?"
+            " ORDER BY listings.position",
+            (source, listing, page),
+        )
+    ]
+    return items, bool(row["has_next_page"])
+
+
+def anime_pagination(animes: list[dict], page: int, has_next_page: bool) -> dict:
+    # the shape the genre listing scrapers return
+    return {
+        "animes": animes,
+        "pagination": {
+            "total_items": len(animes),
+            "current_page": page,
+            "has_next_page": has_next_page,
+            "has_prev_page": page > 1,
+        },
+    }
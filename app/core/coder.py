@@ -0,0 +1,113 @@
+import hashlib
+import zlib
+from typing import Any
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi_cache.coder import Coder, JsonCoder
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+from app import config
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# first byte of every value, bump it when the layout below changes. Version
+# 1 values had no digest and are still read
+VERSION = 2
+DIGEST_SIZE = 16
+
+# second byte, how the json body after it is compressed
+RAW = 0
+ZLIB = 1
+ZSTD = 2
+
+
+def default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    return jsonable_encoder(value)
+
+
+def compression() -> int:
+    codec = {"auto": ZSTD, "none": RAW, "zlib": ZLIB, "zstd": ZSTD}[
+        config.CACHE_COMPRESSION
+    ]
+    return ZLIB if codec == ZSTD and zstandard is None else codec
+
+
+class CompactCoder(Coder):
+    """orjson values, compressed above CACHE_COMPRESS_MIN_BYTES.
+
+    Values are `VERSION, codec, digest, body`, the digest is a blake2b of
+    the json before compression and the ETag of the value. JSON written by
+    JsonCoder before the switch is still read, values this process cannot
+    read (a newer version, or zstd without zstandard installed) are reported
+    by `supports` so the cache treats them as a miss instead of failing the
+    request.
+    """
+
+    @classmethod
+    def encode(cls, value: Any) -> bytes:
+        if isinstance(value, JSONResponse):
+            body = bytes(value.body)
+        else:
+            body = orjson.dumps(value, default=default)
+
+        digest = hashlib.blake2b(body, digest_size=DIGEST_SIZE).digest()
+        codec = compression() if len(body) >= config.CACHE_COMPRESS_MIN_BYTES else RAW
+
+        if codec == ZSTD:
+            body = zstandard.ZstdCompressor(level=config.CACHE_COMPRESS_LEVEL).compress(
+                body
+            )
+        elif codec == ZLIB:
+            body = zlib.compress(body, config.CACHE_COMPRESS_LEVEL)
+
+        return bytes((VERSION, codec)) + digest + body
+
+    @classmethod
+    def decode(cls, value: bytes) -> Any:
+        if not cls.tagged(value):
+            return JsonCoder.decode(value)
+
+        if not cls.supports(value):
+            raise ValueError(f"Unsupported cache value {value[:2]!r}")
+
+        codec, body = value[1], memoryview(value)[cls.header_size(value) :]
+
+        if codec == ZSTD:
+            body = zstandard.ZstdDecompressor().decompress(body)
+        elif codec == ZLIB:
+            body = zlib.decompress(body)
+
+        return orjson.loads(body)
+
+    @classmethod
+    def tagged(cls, value: bytes) -> bool:
+        # json never starts with a control byte
+        return len(value) > 1 and value[0] < 0x20 and value[0] not in b"\t\n\r"
+
+    @classmethod
+    def supports(cls, value: bytes) -> bool:
+        if not cls.tagged(value):
+            return True
+        if value[0] not in (1, VERSION):
+            return False
+        return value[1] in (RAW, ZLIB) or (value[1] == ZSTD and zstandard is not None)
+
+    @classmethod
+    def header_size(cls, value: bytes) -> int:
+        return 2 + DIGEST_SIZE if value[0] == VERSION else 2
+
+    @classmethod
+    def etag(cls, value: bytes) -> str:
+        """Strong ETag of a cached value, read from the value itself."""
+        if cls.tagged(value) and value[0] == VERSION:
+            digest = value[2 : 2 + DIGEST_SIZE]
+        else:
+            digest = hashlib.blake2b(value, digest_size=DIGEST_SIZE).digest()
+        return f'"{digest.hex()}"'
@@ -0,0 +1,76 @@
+import asyncio
+import multiprocessing
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TypeVar
+
+from app import config
+
+T = TypeVar("T")
+
+pool: ProcessPoolExecutor | None = None
+pending: asyncio.Semaphore | None = None
+
+
+def warmup() -> None:
+    # import the scrapers once per worker instead of on the first parse
+    import app.scrapers.animenewsnetwork  # noqa: F401
+    import app.scrapers.komiku  # noqa: F401
+    import app.scrapers.otakudesu  # noqa: F401
+    import app.scrapers.samehadaku  # noqa: F401
+
+
+def create_pool() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=config.PARSER_POOL_SIZE,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=warmup,
+    )
+
+
+async def startup() -> None:
+    global pool, pending
+    if config.PARSER_POOL_SIZE > 0:
+        pool = create_pool()
+        pending = asyncio.Semaphore(max(config.PARSER_MAX_PENDING, 1))
+
+
+async def shutdown() -> None:
+    global pool
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+        pool = None
+
+
+async def parse(extract: Callable[..., T], *args) -> T:
+    """Run a scraper extract function off the event loop.
+
+    Falls back to parsing inline when the pool is disabled or not started,
+    e.g. when a route function is called outside of the app lifespan.
+    """
+    if pool is None:
+        return extract(*args)
+    return await run(extract, *args)
+
+
+async def run(function: Callable[..., T], *args) -> T:
+    """Run a cpu bound function in the pool, in a thread without one."""
+    global pool
+    if pool is None:
+        return await asyncio.to_thread(function, *args)
+
+    used = pool
+    async with pending:
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                used, function, *args
+            )
+        except BrokenProcessPool:
+            # a worker died (e.g. killed for memory), replace the pool so the
+            # next request does not fail too. Every call in flight on it fails
+            # at once, only the first one replaces it
+            if pool is used:
+                used.shutdown(wait=False, cancel_futures=True)
+                pool = create_pool()
+            raise
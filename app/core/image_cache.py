@@ -0,0 +1,313 @@
+"""On-disk cache of the images the scraped sites link to.
+
+Images are stored once per content hash under blobs/, urls/ maps the hash
+of every proxied url to its blob, content type and fetch time. The sha256
+of the content is the strong ETag. A blob's mtime is bumped whenever it is
+served, once the blobs outgrow IMAGE_CACHE_MAX_BYTES the least recently
+served ones are removed. Only http(s) urls on the default ports of a host
+under IMAGE_HOSTS are fetched, redirects included.
+
+Resized or transcoded variants are rendered in the parser pool, at most
+IMAGE_RESIZE_CONCURRENCY at a time, and cached like the originals under the
+hash of the original's digest and the variant parameters.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from functools import partial
+from pathlib import Path
+from typing import NamedTuple
+
+import httpx
+from fastapi import HTTPException
+
+from app import config
+from app.core import executor, thumbnail, upstream
+
+logger = logging.getLogger(__name__)
+
+root: Path | None = None
+size = 0
+# url or variant -> download or render in flight in this process
+loading: dict[str, asyncio.Task] = {}
+evicting: asyncio.Task | None = None
+resizing: asyncio.Semaphore | None = None
+
+
+class Image(NamedTuple):
+    path: Path
+    content_type: str
+    etag: str
+
+
+async def startup() -> None:
+    global root, size, resizing
+    if not config.IMAGE_CACHE_DIR:
+        return
+
+    resizing = asyncio.Semaphore(config.IMAGE_RESIZE_CONCURRENCY)
+    root = Path(config.IMAGE_CACHE_DIR)
+    for directory in ("blobs", "urls", "tmp"):
+        (root / directory).mkdir(parents=True, exist_ok=True)
+    size = await asyncio.to_thread(blobs_size)
+
+
+async def shutdown() -> None:
+    global root
+    for task in list(loading.values()):
+        task.cancel()
+    root = None
+
+
+def blobs_size() -> int:
+    return sum(path.stat().st_size for path in (root / "blobs").glob("*/*"))
+
+
+def allowed(url: str) -> str:
+    """The IMAGE_HOSTS domain the url belongs to, 403 for anything else."""
+    try:
+        parsed = httpx.URL(url)
+    except httpx.InvalidURL:
+        raise HTTPException(status_code=400, detail="Invalid image url")
+
+    if parsed.scheme not in ("http", "https") or parsed.port not in (None, 80, 443):
+        raise HTTPException(status_code=400, detail="Invalid image url")
+
+    for domain in config.IMAGE_HOSTS:
+        if parsed.host == domain or parsed.host.endswith("." + domain):
+            return domain
+    raise HTTPException(status_code=403, detail="Image host not allowed")
+
+
+def hashed(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def blob(digest: str) -> Path:
+    return root / "blobs" / digest[:2] / digest
+
+
+def url_entry(url: str) -> Path:
+    return root / "urls" / hashed(url)
+
+
+async def get(
+    url: str,
+    width: int | None = None,
+    quality: int = 80,
+    format: str | None = None,
+) -> Image:
+    """The cached image of `url`, downloaded first on a miss.
+
+    With a width or format it is the resized or transcoded variant, the
+    original when Pillow is not installed.
+    """
+    allowed(url)
+    if root is None:
+        raise HTTPException(status_code=503, detail="Image cache is disabled")
+
+    image = await asyncio.to_thread(lookup, url)
+    if image is None:
+        image = await shared(url, partial(download, url))
+
+    if (width is None and format is None) or not thumbnail.available():
+        return image
+    if format is not None and not thumbnail.supports(format):
+        raise HTTPException(status_code=400, detail=f"{format} is not supported")
+
+    name = f"{image.path.name}:{width}:{quality}:{format}"
+    variant = await asyncio.to_thread(lookup, name)
+    if variant is None:
+        variant = await shared(
+            name, partial(resize, image, name, width, quality, format)
+        )
+    return variant
+
+
+async def shared(name: str, load: Callable[[], Awaitable[Image]]) -> Image:
+    # concurrent requests for one image share its download or render
+    if name not in loading:
+        loading[name] = asyncio.create_task(load())
+        loading[name].add_done_callback(lambda _: loading.pop(name, None))
+    return await asyncio.shield(loading[name])
+
+
+def lookup(url: str) -> Image | None:
+    try:
+        entry = json.loads(url_entry(url).read_text())
+    except (OSError, ValueError):
+        return None
+
+    if time.time() - entry["fetched_at"] > config.IMAGE_CACHE_TTL:
+        return None
+
+    path = blob(entry["digest"])
+    try:
+        # most recently served, the last to be evicted
+        os.utime(path)
+    except OSError:
+        return None
+    return Image(path, entry["content_type"], f'"{entry["digest"]}"')
+
+
+async def download(url: str) -> Image:
+    try:
+        return await fetch(url)
+    except httpx.TimeoutException:
+        raise HTTPException(status_code=504, detail="Image host timed out")
+    except httpx.HTTPError:
+        raise HTTPException(status_code=502, detail="Image host unreachable")
+
+
+async def fetch(url: str) -> Image:
+    current = url
+    for _ in range(config.IMAGE_MAX_REDIRECTS + 1):
+        domain = allowed(current)
+        host = httpx.URL(current).host
+
+        async with upstream.get_client().stream(
+            "GET",
+            current,
+            # most of the sites block images hotlinked from elsewhere
+            headers={"Referer": f"https://{domain}/"},
+            timeout=upstream.timeout(host),
+        ) as response:
+            if httpx.codes.is_redirect(response.status_code):
+                location = response.headers.get("location")
+                if location is None:
+                    raise HTTPException(
+                        status_code=502, detail="Image redirect without a location"
+                    )
+                current = str(response.url.join(location))
+                continue
+            if response.status_code == 404:
+                raise HTTPException(status_code=404, detail="Image not found")
+            if response.status_code != 200:
+                raise HTTPException(
+                    status_code=502,
+                    detail=f"Image host answered {response.status_code}",
+                )
+
+            content_type = response.headers.get("content-type", "").split(";")[0]
+            if not content_type.startswith("image/"):
+                raise HTTPException(status_code=502, detail="Not an image")
+
+            digest = await save(response)
+
+        # under the requested url, which is what the next lookup asks for,
+        # and under the one it led to for the pages linking there directly
+        for name in {url, current}:
+            await asyncio.to_thread(save_entry, url_entry(name), digest, content_type)
+        return Image(blob(digest), content_type, f'"{digest}"')
+
+    raise HTTPException(status_code=502, detail="Too many image redirects")
+
+
+async def save(response: httpx.Response) -> str:
+    global size
+
+    digest = hashlib.sha256()
+    written = 0
+    temporary = root / "tmp" / uuid.uuid4().hex
+
+    try:
+        with open(temporary, "wb") as file:
+            async for chunk in response.aiter_bytes():
+                written += len(chunk)
+                if written > config.IMAGE_MAX_BYTES:
+                    raise HTTPException(status_code=502, detail="Image too large")
+                digest.update(chunk)
+                await asyncio.to_thread(file.write, chunk)
+
+        path = blob(digest.hexdigest())
+        if await asyncio.to_thread(store, temporary, path):
+            size += written
+    finally:
+        temporary.unlink(missing_ok=True)
+
+    if size > config.IMAGE_CACHE_MAX_BYTES:
+        evict()
+    return digest.hexdigest()
+
+
+async def resize(
+    image: Image, name: str, width: int | None, quality: int, format: str | None
+) -> Image:
+    global size
+
+    digest = hashed(name)
+    path = blob(digest)
+    temporary = root / "tmp" / uuid.uuid4().hex
+
+    try:
+        async with resizing:
+            try:
+                content_type = await executor.run(
+                    thumbnail.render,
+                    str(image.path),
+                    str(temporary),
+                    width,
+                    quality,
+                    format,
+                )
+            except Exception:
+                logger.warning("Error resizing %s", image.path, exc_info=True)
+                raise HTTPException(status_code=502, detail="Could not resize image")
+
+        written = temporary.stat().st_size
+        if await asyncio.to_thread(store, temporary, path):
+            size += written
+    finally:
+        temporary.unlink(missing_ok=True)
+
+    await asyncio.to_thread(save_entry, url_entry(name), digest, content_type)
+    if size > config.IMAGE_CACHE_MAX_BYTES:
+        evict()
+    return Image(path, content_type, f'"{digest}"')
+
+
+def store(temporary: Path, path: Path) -> bool:
+    # the same image under another url is stored once
+    if path.exists():
+        return False
+    path.parent.mkdir(exist_ok=True)
+    os.replace(temporary, path)
+    return True
+
+
+def save_entry(path: Path, digest: str, content_type: str) -> None:
+    temporary = root / "tmp" / uuid.uuid4().hex
+    temporary.write_text(
+        json.dumps(
+            {"digest": digest, "content_type": content_type, "fetched_at": time.time()}
+        )
+    )
+    os.replace(temporary, path)
+
+
+def evict() -> None:
+    global evicting
+    if evicting is None or evicting.done():
+        evicting = asyncio.create_task(asyncio.to_thread(remove_oldest))
+
+
+def remove_oldest() -> None:
+    # down to 90% so every new image does not trigger another pass
+    global size
+
+    blobs = sorted(
+        ((path.stat(), path) for path in (root / "blobs").glob("*/*")),
+        key=lambda item: item[0].st_mtime,
+    )
+    size = sum(stat.st_size for stat, _ in blobs)
+    for stat, path in blobs:
+        if size <= config.IMAGE_CACHE_MAX_BYTES * 0.9:
+            break
+        path.unlink(missing_ok=True)
+        size -= stat.st_size
@@ -0,0 +1,145 @@
+"""In-process fuzzy title search over the catalog.
+
+Every title (and japanese title) is split into trigrams, each source keeps
+an inverted index from trigram to the titles containing it. The titles
+sharing at least SEARCH_INDEX_MIN_SCORE of the query trigrams are the
+candidates, a candidate only matches when every query word is the start of
+one of its words or shares SEARCH_INDEX_WORD_SCORE of its trigrams with one,
+so "narto" still finds "Naruto" but "one piece" does not find "One Punch
+Man". The catalog is the persisted copy, the index loads it at startup and
+then only reads the rows changed since.
+"""
+
+import asyncio
+import json
+import logging
+import re
+from collections import Counter, defaultdict
+
+from app import config
+from app.core import catalog
+
+logger = logging.getLogger(__name__)
+
+separators = re.compile(r"[\W_]+")
+
+
+def normalize(text: str) -> str:
+    return " ".join(separators.split(text.casefold())).strip()
+
+
+def trigrams(text: str) -> set[str]:
+    # words are padded like pg_trgm, so short words and word starts count
+    grams = set()
+    for word in normalize(text).split():
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TitleIndex:
+    def __init__(self):
+        self.postings: dict[str, set[str]] = defaultdict(set)
+        # id -> (trigrams, words, the listing json of the title)
+        self.titles: dict[str, tuple[set[str], set[str], dict]] = {}
+
+    def add(self, id: str, names: list[str], data: dict) -> None:
+        self.remove(id)
+        names = [name for name in names if name]
+        grams = set().union(*(trigrams(name) for name in names))
+        words = set().union(*(normalize(name).split() for name in names))
+        for gram in grams:
+            self.postings[gram].add(id)
+        self.titles[id] = (grams, words, data)
+
+    def remove(self, id: str) -> None:
+        entry = self.titles.pop(id, None)
+        if entry is None:
+            return
+        for gram in entry[0]:
+            self.postings[gram].discard(id)
+
+    def search(self, query: str, limit: int) -> list[dict]:
+        wanted = trigrams(query)
+        if not wanted:
+            return []
+        query_words = {word: trigrams(word) for word in normalize(query).split()}
+
+        common = Counter()
+        for gram in wanted:
+            common.update(self.postings.get(gram, ()))
+
+        matches = []
+        for id, shared in common.items():
+            score = shared / len(wanted)
+            if score < config.SEARCH_INDEX_MIN_SCORE:
+                continue
+            grams, words, _ = self.titles[id]
+            if not covers(query_words, words):
+                continue
+            # closer titles first when they cover the query equally well
+            similarity = 2 * shared / (len(wanted) + len(grams))
+            matches.append((score, similarity, id))
+
+        matches.sort(reverse=True)
+        return [self.titles[id][2] for _, _, id in matches[:limit]]
+
+
+def covers(query_words: dict[str, set[str]], words: set[str]) -> bool:
+    # a title missing any query word is a weak match, better answered by
+    # the upstream than from the part of the catalog we have
+    for word, grams in query_words.items():
+        if not any(
+            title_word.startswith(word)
+            or len(grams & trigrams(title_word)) / len(grams)
+            >= config.SEARCH_INDEX_WORD_SCORE
+            for title_word in words
+        ):
+            return False
+    return True
+
+
+indexes: dict[str, TitleIndex] = defaultdict(TitleIndex)
+loaded_until = 0.0
+refresher: asyncio.Task | None = None
+
+
+def search(source: str, query: str, limit: int | None = None) -> list[dict]:
+    """Best matching titles of a source, empty when nothing is close enough."""
+    return indexes[source].search(query, limit or config.SEARCH_INDEX_LIMIT)
+
+
+async def load() -> int:
+    """Index the catalog rows changed since the last load."""
+    global loaded_until
+
+    rows = await catalog.titles_since(loaded_until)
+    for row in rows:
+        indexes[row["source"]].add(
+            row["id"], [row["title"], row["japanese_title"]], json.loads(row["data"])
+        )
+        loaded_until = max(loaded_until, row["updated_at"])
+    return len(rows)
+
+
+async def keep_loaded() -> None:
+    while True:
+        await asyncio.sleep(config.SEARCH_INDEX_REFRESH)
+        try:
+            await load()
+        except Exception:
+            logger.warning("Error updating the title index", exc_info=True)
+
+
+async def startup() -> None:
+    global refresher
+    await load()
+    refresher = asyncio.create_task(keep_loaded())
+
+
+async def shutdown() -> None:
+    global refresher
+    if refresher is not None:
+        refresher.cancel()
+        refresher = None
+    indexes.clear()
@@ -0,0 +1,79 @@
+from bs4 import BeautifulSoup, SoupStrainer
+from selectolax.lexbor import LexborHTMLParser, LexborNode
+
+from app import config
+
+HTML_PARSER = "html.parser"
+LXML = "lxml"
+LEXBOR = "lexbor"
+
+backends = {
+    "otakudesu": config.PARSER_OTAKUDESU,
+    "samehadaku": config.PARSER_SAMEHADAKU,
+    "komiku": config.PARSER_KOMIKU,
+    "animenewsnetwork": config.PARSER_ANIMENEWSNETWORK,
+}
+
+
+def backend(source: str) -> str:
+    name = backends.get(source, config.PARSER_DEFAULT)
+    if name not in (HTML_PARSER, LXML, LEXBOR):
+        raise ValueError(f"Unknown parser backend {name!r} for {source}")
+    return name
+
+
+def use_lexbor(source: str) -> bool:
+    return backend(source) == LEXBOR
+
+
+def soup(
+    markup: str | bytes, source: str, parse_only: SoupStrainer | None = None
+) -> BeautifulSoup:
+    """Parse markup with the backend configured for source.
+
+    Listing extractors pass parse_only with the subtrees they read, so only
+    those are materialized instead of the whole page.
+    """
+    # lexbor has no BeautifulSoup tree builder, extractors without a lexbor
+    # implementation use lxml instead
+    features = HTML_PARSER if backend(source) == HTML_PARSER else LXML
+    return BeautifulSoup(markup, features, parse_only=parse_only)
+
+
+def only(tag: str | list[str], *classes: str) -> SoupStrainer:
+    """Strainer keeping every tag element that has any of the classes.
+
+    SoupStrainer compares class_ against the raw attribute while parsing, so
+    a plain class_="herald" would miss class="herald box news".
+    """
+    wanted = set(classes)
+
+    def match(value: str | list[str] | None) -> bool:
+        if value is None:
+            return False
+        if isinstance(value, str):
+            value = value.split()
+        return not wanted.isdisjoint(value)
+
+    return SoupStrainer(tag, class_=match)
+
+
+def tree(markup: str | bytes) -> LexborHTMLParser:
+    if isinstance(markup, bytes):
+        markup = markup.decode("utf-8", "replace")
+    return LexborHTMLParser(markup)
+
+
+def next_sibling(node: LexborNode, tag: str) -> LexborNode | None:
+    # same as BeautifulSoup's find_next_sibling(tag)
+    node = node.next
+    while node is not None and node.tag != tag:
+        node = node.next
+    return node
+
+
+def previous_sibling(node: LexborNode, tag: str) -> LexborNode | None:
+    node = node.prev
+    while node is not None and node.tag != tag:
+        node = node.prev
+    return node
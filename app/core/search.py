@@ -0,0 +1,98 @@
+import logging
+from urllib.parse import quote_plus
+
+from fastapi_cache import FastAPICache
+
+from app import config
+from app.core import backends
+from app.core.cache import readable
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(query: str) -> str:
+    return " ".join(query.casefold().split())
+
+
+def query_key(namespace: str, query: str) -> str:
+    return f"{FastAPICache.get_prefix()}:{namespace}:{quote_plus(normalize(query))}"
+
+
+def upstream_key(namespace: str, query: str) -> str:
+    # the route entries may come from the title index or a prefix and miss
+    # titles, only what the upstream answered is kept here for from_prefix
+    return query_key(namespace + ":upstream", query)
+
+
+def search_key(
+    func, namespace: str = "", *, request=None, response=None, args=(), kwargs=None
+):
+    # "Solo  Leveling" and "solo leveling" share one entry, namespace
+    # already carries the cache prefix
+    return f"{namespace}:{quote_plus(normalize(kwargs['query']))}"
+
+
+async def from_prefix(namespace: str, query: str) -> list[dict] | None:
+    """Answer a search from the upstream results of a shorter query.
+
+    Autocomplete asks for "sol", "solo", "solo l" in turn, the results for
+    "solo l" are the "solo" results whose title contains every word of the
+    query. Only results the upstream answered (see `remember`) shorter than
+    a full upstream page are reused, a full page may have cut off titles the
+    longer query would match.
+    """
+    if not FastAPICache.get_enable():
+        return None
+
+    query = normalize(query)
+    words = query.split()
+    coder = FastAPICache.get_coder()
+
+    # longest first, all of them read in one round trip
+    prefixes = [
+        query[:end]
+        for end in range(len(query) - 1, config.SEARCH_PREFIX_MIN_LENGTH - 1, -1)
+        if not query[:end].endswith(" ")
+    ]
+    if not prefixes:
+        return None
+
+    try:
+        entries = await backends.get_many_with_ttl(
+            [upstream_key(namespace, prefix) for prefix in prefixes]
+        )
+    except Exception:
+        logger.warning("Error reading cached searches of %s", query, exc_info=True)
+        return None
+
+    for _, cached in entries:
+        if not readable(coder, cached):
+            continue
+
+        results = coder.decode(cached)
+        if len(results) >= config.SEARCH_PREFIX_MAX_RESULTS:
+            return None
+
+        return [
+            result
+            for result in results
+            if all(word in result["title"].casefold() for word in words)
+        ]
+
+    return None
+
+
+async def remember(namespace: str, query: str, results: list[dict]) -> None:
+    """Keep what the upstream answered for a search, for `from_prefix`."""
+    if not FastAPICache.get_enable():
+        return
+
+    try:
+        # as long as the route entry is fresh, a prefix answer is never older
+        await FastAPICache.get_backend().set(
+            upstream_key(namespace, query),
+            FastAPICache.get_coder().encode(results),
+            config.SEARCH_CACHE_TTL,
+        )
+    except Exception:
+        logger.warning("Error caching the search for %s", query, exc_info=True)
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+from fastapi_cache import FastAPICache
+
+from app import config
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+# shared fetches in flight in this process, keyed by cache key and whether
+# they wait for another worker's value
+flights: dict[tuple[str, bool], asyncio.Task] = {}
+
+release_script = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+async def do(
+    key: str,
+    fetch: Callable[[], Awaitable[T]],
+    lookup: Callable[[], Awaitable[T | None]] | None = None,
+) -> T | None:
+    """Run fetch once for every concurrent caller of the same key.
+
+    Callers in this process await one shared task. Across workers the task
+    takes a redis lock first, a worker that finds it taken polls lookup until
+    the lock holder has stored the value. Without lookup nothing is waited
+    for and None is returned when another worker is already fetching, so
+    callers with and without lookup never share a flight.
+    """
+    flight = (key, lookup is not None)
+    task = flights.get(flight)
+    if task is None:
+        task = asyncio.create_task(run(key, fetch, lookup))
+        flights[flight] = task
+        task.add_done_callback(lambda _: forget(flight, task))
+
+    # a cancelled caller must not cancel the fetch the others are waiting on
+    return await asyncio.shield(task)
+
+
+def forget(flight: tuple[str, bool], task: asyncio.Task) -> None:
+    if flights.get(flight) is task:
+        del flights[flight]
+
+
+def lock_client():
+    # only the redis backend is shared between workers
+    return getattr(FastAPICache.get_backend(), "redis", None)
+
+
+async def run(key, fetch, lookup):
+    redis = lock_client()
+    if redis is None:
+        return await fetch()
+
+    lock = key + ":lock"
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + config.SINGLEFLIGHT_WAIT
+
+    while True:
+        try:
+            acquired = await redis.set(
+                lock, token, nx=True, px=int(config.SINGLEFLIGHT_LOCK_TTL * 1000)
+            )
+        except Exception:
+            logger.warning("Error taking lock %s", lock, exc_info=True)
+            return await fetch()
+
+        if acquired:
+            try:
+                return await fetch()
+            finally:
+                try:
+                    await redis.eval(release_script, 1, lock, token)
+                except Exception:
+                    logger.warning("Error releasing lock %s", lock, exc_info=True)
+
+        if lookup is None:
+            return None
+
+        await asyncio.sleep(config.SINGLEFLIGHT_POLL)
+
+        found = await lookup()
+        if found is not None:
+            return found
+
+        # the lock holder died or is too slow, fetch it ourselves
+        if time.monotonic() > deadline:
+            return await fetch()
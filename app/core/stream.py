@@ -0,0 +1,89 @@
+"""Newline delimited json responses.
+
+Multi-page listings are streamed item by item: up to STREAM_PREFETCH_PAGES
+pages are fetched ahead through the cached page routes, so the first items
+go out while later pages load and memory stays bounded by the prefetch
+window instead of the whole listing.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable
+
+import orjson
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+from app import config
+
+logger = logging.getLogger(__name__)
+
+# fetch(page) -> (items, has_next_page)
+Fetch = Callable[[int], Awaitable[tuple[list, bool]]]
+
+
+def ndjson(items: AsyncIterator) -> StreamingResponse:
+    """Stream every item as one json line. The status is already sent when
+    a later page fails, so the failure becomes a last {"error": ...} line.
+    """
+
+    async def lines() -> AsyncIterator[bytes]:
+        try:
+            async for item in items:
+                yield orjson.dumps(jsonable_encoder(item)) + b"\n"
+        except HTTPException as error:
+            yield orjson.dumps({"error": error.detail}) + b"\n"
+        except Exception:
+            logger.warning("Error streaming a response", exc_info=True)
+            yield orjson.dumps({"error": "Internal Server Error"}) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+async def pages(fetch: Fetch, start: int = 1) -> AsyncIterator:
+    """Items of every page from `start` on, until a page has no next page."""
+    end = start + config.STREAM_MAX_PAGES
+    ahead: deque[asyncio.Task] = deque()
+    page = start
+
+    try:
+        while True:
+            while len(ahead) < config.STREAM_PREFETCH_PAGES and page < end:
+                ahead.append(asyncio.create_task(fetch(page)))
+                page += 1
+            if not ahead:
+                return
+
+            items, has_next_page = await ahead.popleft()
+            for item in items:
+                yield item
+
+            if not has_next_page:
+                return
+    finally:
+        # pages fetched past the end (or past a disconnect) are dropped
+        for task in ahead:
+            if task.done() and not task.cancelled():
+                task.exception()
+            task.cancel()
+
+
+def anime_pages(route, **kwargs) -> Fetch:
+    # routes answering AnimePagination, called like the api calls them so
+    # they share its cache entries
+    async def fetch(page: int) -> tuple[list, bool]:
+        result = jsonable_encoder(await route(**kwargs, page=page))
+        return result["animes"], result["pagination"]["has_next_page"]
+
+    return fetch
+
+
+def list_pages(route, **kwargs) -> Fetch:
+    # routes answering a plain list, an empty page is the end
+    async def fetch(page: int) -> tuple[list, bool]:
+        items = jsonable_encoder(await route(**kwargs, page=page))
+        return items, bool(items)
+
+    return fetch
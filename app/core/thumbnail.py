@@ -0,0 +1,38 @@
+"""Resize and transcode images, run in the parser pool.
+
+Pillow is optional, without it `available()` is False and the image proxy
+serves the originals.
+"""
+
+try:
+    from PIL import Image, features
+except ImportError:
+    Image = None
+
+formats = {"webp": "WEBP", "avif": "AVIF", "jpeg": "JPEG", "png": "PNG"}
+
+
+def available() -> bool:
+    return Image is not None
+
+
+def supports(format: str) -> bool:
+    return available() and (format != "avif" or features.check("avif"))
+
+
+def render(
+    source: str, target: str, width: int | None, quality: int, format: str | None
+) -> str:
+    """Write `source` scaled down to `width` (never up) in `format`, the
+    source format when None, and return the content type written."""
+    with Image.open(source) as image:
+        output = formats[format] if format else image.format or "JPEG"
+        if width is not None:
+            # thumbnail keeps the aspect ratio and lets jpeg decode at a
+            # reduced size, far cheaper than a full decode and resize
+            image.thumbnail((width, image.height), Image.Resampling.LANCZOS)
+        if output == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.save(target, format=output, quality=quality, optimize=output == "PNG")
+
+    return Image.MIME[output]
@@ -0,0 +1,199 @@
+import asyncio
+import statistics
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from functools import partial, wraps
+
+import httpx
+from fastapi import HTTPException
+
+from app import config
+from app.core.breaker import Breaker, UpstreamError
+
+# read timeout per upstream host, every known host also gets its own
+# connection pool so one slow source cannot starve the others
+hosts = {
+    "otakudesu.cloud": config.env_float("HTTP_TIMEOUT_OTAKUDESU", config.HTTP_TIMEOUT),
+    "samehadaku.mba": config.env_float("HTTP_TIMEOUT_SAMEHADAKU", 30),
+    "komiku.id": config.env_float("HTTP_TIMEOUT_KOMIKU", config.HTTP_TIMEOUT),
+    "api.komiku.id": config.env_float("HTTP_TIMEOUT_KOMIKU", config.HTTP_TIMEOUT),
+    "www.animenewsnetwork.com": config.env_float(
+        "HTTP_TIMEOUT_ANIMENEWSNETWORK", config.HTTP_TIMEOUT
+    ),
+}
+
+client: httpx.AsyncClient | None = None
+
+# monotonic time the current route has to be done with its upstream calls by
+deadline_at: ContextVar[float | None] = ContextVar("deadline_at", default=None)
+
+breakers: dict[str, Breaker] = {}
+
+# recent response times per host, for the hedging delay
+latencies: dict[str, deque[float]] = defaultdict(
+    lambda: deque(maxlen=config.HTTP_HEDGE_SAMPLES)
+)
+
+
+def limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=config.HTTP_MAX_CONNECTIONS_PER_HOST,
+        max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_PER_HOST,
+        keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def transport() -> httpx.AsyncHTTPTransport:
+    return httpx.AsyncHTTPTransport(http2=config.HTTP2, limits=limits())
+
+
+def timeout(host: str) -> httpx.Timeout:
+    return httpx.Timeout(
+        hosts.get(host, config.HTTP_TIMEOUT), connect=config.HTTP_CONNECT_TIMEOUT
+    )
+
+
+async def startup() -> None:
+    global client
+    client = httpx.AsyncClient(
+        http2=config.HTTP2,
+        limits=limits(),
+        timeout=timeout(""),
+        mounts={"all://" + host: transport() for host in hosts},
+    )
+
+
+async def shutdown() -> None:
+    global client
+    for host_breaker in breakers.values():
+        host_breaker.stop()
+    breakers.clear()
+    if client is not None:
+        await client.aclose()
+        client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    assert client is not None, "upstream client is not started"
+    return client
+
+
+def deadline(seconds: float):
+    """Give every upstream call a route makes one shared budget of `seconds`.
+
+    A call still running when the budget is spent is cancelled and the route
+    answers 504. Nested deadlines keep the earlier one.
+    """
+
+    def wrapper(func):
+        @wraps(func)
+        async def inner(*args, **kwargs):
+            at = time.monotonic() + seconds
+            current = deadline_at.get()
+            token = deadline_at.set(at if current is None else min(at, current))
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                deadline_at.reset(token)
+
+        return inner
+
+    return wrapper
+
+
+def breaker(host: str) -> Breaker:
+    if host not in breakers:
+        breakers[host] = Breaker(host, partial(probe, host))
+    return breakers[host]
+
+
+async def probe(host: str) -> bool:
+    # straight to the client, every other call is refused while open
+    response = await get_client().get("https://" + host + "/", timeout=timeout(host))
+    return response.status_code < 500
+
+
+def remaining() -> float | None:
+    at = deadline_at.get()
+    return None if at is None else at - time.monotonic()
+
+
+def hedge_delay(host: str) -> float | None:
+    samples = latencies[host]
+    if len(samples) < config.HTTP_HEDGE_MIN_SAMPLES:
+        return None
+    return statistics.quantiles(samples, n=20)[-1]
+
+
+async def request(method: str, url: str, **kwargs) -> httpx.Response:
+    host = httpx.URL(url).host
+    kwargs.setdefault("timeout", timeout(host))
+
+    budget = remaining()
+    if budget is not None and budget <= 0:
+        raise HTTPException(status_code=504, detail="Upstream deadline exceeded")
+
+    host_breaker = breaker(host)
+    host_breaker.check()
+
+    send = partial(get_client().request, method, url, **kwargs)
+    # only GETs are safe to send twice
+    delay = hedge_delay(host) if config.HTTP_HEDGE and method == "GET" else None
+
+    started = time.monotonic()
+    try:
+        response = await asyncio.wait_for(timed(host, send, delay), budget)
+    except asyncio.TimeoutError:
+        host_breaker.record(False, time.monotonic() - started)
+        raise HTTPException(status_code=504, detail="Upstream deadline exceeded")
+    except httpx.HTTPError:
+        host_breaker.record(False, time.monotonic() - started)
+        raise
+
+    host_breaker.record(response.status_code < 500, time.monotonic() - started)
+    # an error page would only fail the parsers further down
+    if response.status_code >= 500:
+        raise UpstreamError(host, response.status_code)
+    return response
+
+
+async def timed(host: str, send, delay: float | None) -> httpx.Response:
+    started = time.monotonic()
+    response = await (send() if delay is None else hedged(send, delay))
+    latencies[host].append(time.monotonic() - started)
+    return response
+
+
+async def hedged(send, delay: float) -> httpx.Response:
+    # a second attempt once the first is slower than usual, the first
+    # successful response wins and the other attempt is cancelled
+    attempts = [asyncio.ensure_future(send())]
+    try:
+        done, _ = await asyncio.wait(attempts, timeout=delay)
+        if done:
+            return attempts[0].result()
+
+        attempts.append(asyncio.ensure_future(send()))
+        pending = set(attempts)
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for attempt in done:
+                if attempt.exception() is None:
+                    return attempt.result()
+
+        # both failed, raise the first error
+        return attempts[0].result()
+    finally:
+        for attempt in attempts:
+            attempt.cancel()
+
+
+async def get(url: str, **kwargs) -> httpx.Response:
+    return await request("GET", url, **kwargs)
+
+
+async def post(url: str, **kwargs) -> httpx.Response:
+    return await request("POST", url, **kwargs)
@@ -0,0 +1,130 @@
+"""Walk the genre listings of both anime sources and komiku's recent manga
+pages into the local catalog.
+
+Every listing is read from page 1. Once CATALOG_STOP_UNCHANGED pages in a row
+came back unchanged, pages crawled less than CATALOG_RECRAWL_AFTER seconds
+ago are skipped, so a pass only refetches what is new or getting old. It runs
+inside the app with CATALOG_CRAWLER_ENABLED=true, or on its own:
+
+    python -m app.crawler
+"""
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+
+from fastapi import HTTPException
+
+from app import config
+from app.core import backends, catalog, executor, upstream
+from app.routers import manga
+from app.routers.anime import otakudesu, samehadaku
+
+logger = logging.getLogger(__name__)
+
+# fetch(page) -> (items, has_next_page)
+Fetch = Callable[[int], Awaitable[tuple[list[dict], bool]]]
+
+
+async def crawl(source: str, listing: str, fetch: Fetch) -> int:
+    """Crawl one listing, returns how many rows changed."""
+    changed = 0
+    unchanged = 0
+
+    for page in range(1, config.CATALOG_MAX_PAGES + 1):
+        if unchanged >= config.CATALOG_STOP_UNCHANGED:
+            crawled = await catalog.crawled(source, listing, page)
+            if crawled is not None and crawled[0] < config.CATALOG_RECRAWL_AFTER:
+                if not crawled[1]:
+                    break
+                continue
+
+        try:
+            items, has_next_page = await fetch(page)
+        except HTTPException:
+            # the listing is gone or shorter than we thought
+            break
+
+        page_changed = await catalog.save(source, listing, page, items, has_next_page)
+        changed += page_changed
+        unchanged = 0 if page_changed else unchanged + 1
+
+        if not has_next_page:
+            break
+
+    return changed
+
+
+def anime_listing(fetch_genres_anime, id: str) -> Fetch:
+    async def fetch(page: int) -> tuple[list[dict], bool]:
+        result = await fetch_genres_anime(id, page)
+        return result["animes"], result["pagination"]["has_next_page"]
+
+    return fetch
+
+
+async def recent_manga(page: int) -> tuple[list[dict], bool]:
+    mangas = await manga.fetch_recent_update(page)
+    return mangas, bool(mangas)
+
+
+async def listings() -> list[tuple[str, str, Fetch]]:
+    found = [(manga.scraper.source, "recent", recent_manga)]
+
+    for router, get_genres in (
+        (otakudesu, otakudesu.get_genres),
+        (samehadaku, samehadaku.genres),
+    ):
+        # the undecorated route, a cache hit would return plain json
+        for genre in await get_genres.__wrapped__():
+            found.append(
+                (
+                    router.scraper.source,
+                    "genre:" + genre.id,
+                    anime_listing(router.fetch_genres_anime, genre.id),
+                )
+            )
+
+    return found
+
+
+async def crawl_all() -> None:
+    limit = asyncio.Semaphore(config.CATALOG_CONCURRENCY)
+
+    async def crawl_one(source: str, listing: str, fetch: Fetch) -> None:
+        async with limit:
+            try:
+                changed = await crawl(source, listing, fetch)
+                logger.info("Crawled %s %s, %d changed", source, listing, changed)
+            except Exception:
+                logger.warning("Error crawling %s %s", source, listing, exc_info=True)
+
+    await asyncio.gather(*(crawl_one(*listing) for listing in await listings()))
+
+
+async def run() -> None:
+    while True:
+        try:
+            await crawl_all()
+        except Exception:
+            logger.warning("Error listing what to crawl", exc_info=True)
+        await asyncio.sleep(config.CATALOG_CRAWL_INTERVAL)
+
+
+async def main() -> None:
+    await upstream.startup()
+    await executor.startup()
+    await backends.startup()
+    await catalog.startup()
+    try:
+        await run()
+    finally:
+        await catalog.shutdown()
+        await backends.shutdown()
+        await executor.shutdown()
+        await upstream.shutdown()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -1,11 +1,16 @@
+import asyncio
 import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 
 from dotenv import load_dotenv
 from fastapi import Depends, FastAPI, HTTPException, Security, status
 from fastapi.security import APIKeyHeader
 from fastapi_cache import FastAPICache
 
-from app.routers import ai, manga, news
+from app import config, crawler, warmer
+from app.core import backends, catalog, executor, image_cache, index, upstream
+from app.routers import ai, cache, images, manga, news, search
 from app.routers.anime import otakudesu, samehadaku
 from app.routers.tools import social_media_downloader
 
@@ -21,7 +26,32 @@ def check_api_key(api_key: str = Security(api_key_header)):
     return True
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    await upstream.startup()
+    await executor.startup()
+    await backends.startup()
+    await catalog.startup()
+    await index.startup()
+    await image_cache.startup()
+    if config.WARMER_ENABLED:
+        warming = asyncio.create_task(warmer.run())
+    if config.CATALOG_CRAWLER_ENABLED:
+        crawling = asyncio.create_task(crawler.run())
+    yield
+    if config.CATALOG_CRAWLER_ENABLED:
+        crawling.cancel()
+    if config.WARMER_ENABLED:
+        warming.cancel()
+    await image_cache.shutdown()
+    await index.shutdown()
+    await catalog.shutdown()
+    await backends.shutdown()
+    await executor.shutdown()
+    await upstream.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(
     ai.router, prefix="/ai", tags=["ai"], dependencies=[Depends(check_api_key)]
 )
@@ -33,6 +63,14 @@ app.include_router(
 )
 app.include_router(manga.router, prefix="/manga", tags=["manga"])
 app.include_router(news.router, prefix="/news", tags=["news"])
+app.include_router(search.router, prefix="/search", tags=["search"])
+app.include_router(images.router, prefix="/images", tags=["images"])
+app.include_router(
+    cache.router,
+    prefix="/cache",
+    tags=["cache"],
+    dependencies=[Depends(check_api_key)],
+)
 app.include_router(
     social_media_downloader.router,
     prefix="/tools/social-media-downloader",
@@ -45,6 +83,14 @@ async def root():
     return {"status": "ok", "docs": "/docs"}
 
 
+@app.get("/health")
+async def health():
+    """Circuit breaker state of every upstream host."""
+    upstreams = {host: upstream.breaker(host).status() for host in upstream.hosts}
+    degraded = any(status["state"] == "open" for status in upstreams.values())
+    return {"status": "degraded" if degraded else "ok", "upstreams": upstreams}
+
+
 @app.get("/clear")
 async def clear():
-    return await FastAPICache.clear()
+    return await backends.delete_matching(FastAPICache.get_prefix() + ":*")
@@ -18,6 +18,7 @@ class Anime(BaseModel):
 class Schedule(BaseModel):
     day: str = Field(examples=["monday"])
     animes: list[Anime]
+    error: str | None = Field(default=None, examples=[None])
 
 
 class Pagination(BaseModel):
@@ -75,9 +76,10 @@ class EpisodesDetail(BaseModel):
     id: str = Field(examples=["solo-level-s2-sub-indo"])
     episode_id: str = Field(examples=["solo-level-s2-sub-indo-episode-1"])
     title: str = Field(examples=["Solo Leveling Season 2 Episode 1"])
-    default_stream_url: str = Field(
+    default_stream_url: str | None = Field(
         examples=["https://otakudesu.cloud/episode/solo-level-s2-sub-indo-episode-1"]
     )
+    default_server_id: str | None = Field(default=None, examples=["otakudesu"])
     servers: dict[str, list[Server]] | None = Field(
         example=[{"480p": {"id": "otakudesu", "name": "OtakuDesu"}}]
     )
@@ -0,0 +1,21 @@
+from typing import Generic, TypeVar
+
+from pydantic import BaseModel, Field
+
+from app import config
+
+T = TypeVar("T")
+
+
+class BatchRequest(BaseModel):
+    ids: list[str] = Field(
+        min_length=1,
+        max_length=config.BATCH_MAX_IDS,
+        examples=[["solo-level-s2-sub-indo", "one-piece-sub-indo"]],
+    )
+
+
+class BatchItem(BaseModel, Generic[T]):
+    result: T | None = None
+    error: str | None = Field(default=None, examples=["Anime not found"])
+    status_code: int = Field(default=200, examples=[200])
@@ -0,0 +1,17 @@
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+from app.models.anime import Anime
+from app.models.manga import Manga
+
+
+class SourceStatus(BaseModel):
+    status: Literal["ok", "error", "timeout"] = Field(examples=["ok"])
+    total_items: int = Field(examples=[10])
+
+
+class SearchResults(BaseModel):
+    animes: list[Anime]
+    mangas: list[Manga]
+    sources: dict[str, SourceStatus]
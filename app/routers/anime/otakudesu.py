@@ -1,158 +1,130 @@
+import asyncio
 import base64
 import json
-import re
+import logging
+import time
 from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
+from urllib.parse import quote_plus
 
 import httpx
-from bs4 import BeautifulSoup
 from fastapi import APIRouter, HTTPException
 from fastapi_cache import FastAPICache
-from fastapi_cache.backends.redis import RedisBackend
-from fastapi_cache.decorator import cache
-from redis import asyncio as aioredis
 
+from app import config
+from app.core import catalog, executor, index, upstream
+from app.core.batch import details
+from app.core.cache import cache
+from app.core.search import from_prefix, normalize, remember, search_key
+from app.core.stream import anime_pages, ndjson, pages
 from app.models.anime import (
     Anime,
     AnimeDetail,
     AnimePagination,
-    Download,
-    Episodes,
     EpisodesDetail,
     Genre,
-    Pagination,
-    Server,
     ServerDetail,
 )
+from app.models.batch import BatchItem, BatchRequest
+from app.scrapers import otakudesu as scraper
 
 
 @asynccontextmanager
 async def lifespan(_: APIRouter) -> AsyncIterator[None]:
-    redis = aioredis.from_url("redis://localhost")
-    FastAPICache.init(RedisBackend(redis), prefix="fastapi-cache")
+    refresher = asyncio.create_task(keep_nonce_fresh())
     yield
+    refresher.cancel()
 
 
 router = APIRouter(lifespan=lifespan)
 app_url = "https://otakudesu.cloud"
+logger = logging.getLogger(__name__)
 
-
-@cache()
-async def get_cache():
-    return 1
+nonce: str | None = None
+nonce_expires_at = 0.0
+nonce_lock = asyncio.Lock()
 
 
 @router.get("/search", response_model=list[Anime])
+@cache(
+    expire=config.SEARCH_CACHE_TTL,
+    stale=config.SEARCH_CACHE_STALE,
+    namespace="otakudesu:search",
+    key_builder=search_key,
+)
+@upstream.deadline(config.ROUTE_DEADLINE_SEARCH)
 async def search(query: str):
-    html = httpx.get(
-        app_url + "/?s=" + query + "&post_type=anime",
-        follow_redirects=True,
+    animes = index.search(scraper.source, query) or await from_prefix(
+        "otakudesu:search", query
     )
 
-    soup = BeautifulSoup(html.content, "html.parser")
-
-    animes = []
-
-    animes_section = soup.find("ul", class_="chivsrc")
-
-    for anime in animes_section.find_all("li"):
-        id = anime.find("a")["href"].split("/")[-2]
-        title = re.sub(
-            r"\s+",
-            " ",
-            re.sub(r"\(.*?\)", "", anime.find("h2").text)
-            .replace("Subtitle Indonesia", "")
-            .strip(),
-        )
-        image = anime.find("img")["src"]
-        animes.append(
-            Anime(
-                id=id,
-                title=title,
-                episodes=None,
-                image=image,
-            )
+    if animes is None:
+        html = await upstream.get(
+            app_url + "/?s=" + quote_plus(normalize(query)) + "&post_type=anime",
+            follow_redirects=True,
         )
 
-    return animes
+        animes = await executor.parse(scraper.search, html.content)
+        await remember("otakudesu:search", query, animes)
+
+    return [Anime(**anime) for anime in animes]
 
 
 @router.get("/ongoing", response_model=AnimePagination)
-@cache(expire=3600)
+@cache(expire=3600, namespace="otakudesu:ongoing")
+@upstream.deadline(config.ROUTE_DEADLINE)
 async def ongoing_anime(page: int = 1):
-    html = httpx.get(
+    html = await upstream.get(
         app_url + "/ongoing-anime" + "/page" + "/" + str(page), follow_redirects=True
     )
 
-    soup = BeautifulSoup(html.text, "html.parser")
-
-    animes = []
-
-    animes_section = soup.find("div", class_="venz")
-
-    for anime in animes_section.find_all("li"):
-        id = anime.find("a")["href"].split("/")[-2]
-        title = anime.find("h2", class_="jdlflm").text
-        try:
-            episodes = int(anime.find("div", class_="epz").text.split(" ")[2])
-        except (AttributeError, IndexError, ValueError):
-            episodes = None
-        image = anime.find("img")["src"]
-        animes.append(
-            Anime(
-                id=id,
-                title=title,
-                episodes=episodes,
-                image=image,
-            )
-        )
-
-    pagination = soup.find("div", class_="pagination")
-    has_next_page = pagination.find("a", class_="next page-numbers") is not None
-    has_prev_page = pagination.find("a", class_="prev page-numbers") is not None
-
     return AnimePagination(
-        animes=animes,
-        pagination=Pagination(
-            total_items=len(animes),
-            current_page=page,
-            has_next_page=has_next_page,
-            has_prev_page=has_prev_page,
-        ),
+        **await executor.parse(scraper.ongoing_anime, html.text, page)
     )
 
 
+@router.get("/ongoing/stream")
+async def ongoing_anime_stream(page: int = 1):
+    """Every ongoing anime from `page` on as newline delimited json, one
+    Anime per line."""
+    return ndjson(pages(anime_pages(ongoing_anime), page))
+
+
 @router.get("/genres", response_model=list[Genre])
-@cache(expire=3600)
+@cache(expire=3600, namespace="otakudesu:genres")
+@upstream.deadline(config.ROUTE_DEADLINE)
 async def get_genres():
-    html = httpx.get(
+    html = await upstream.get(
         app_url + "/genre-list",
         follow_redirects=True,
     )
 
-    soup = BeautifulSoup(html.text, "html.parser")
+    genres = await executor.parse(scraper.get_genres, html.text)
 
-    genres = []
+    return [Genre(**genre) for genre in genres]
 
-    genres_section = soup.find("ul", class_="genres").find("li")
 
-    for genre in genres_section.find_all("a"):
-        id = genre["href"].split("/")[-2]
-        name = genre.text.strip()
-        genres.append(
-            Genre(
-                id=id,
-                name=name,
-            )
-        )
+@router.get("/genres/{id}", response_model=AnimePagination)
+@cache(expire=3600, namespace="otakudesu:genres")
+@upstream.deadline(config.ROUTE_DEADLINE)
+async def get_genres_anime(id: str, page: int = 1):
+    local = await catalog.listing(scraper.source, "genre:" + id, page)
+    if local is not None:
+        animes, has_next_page = local
+        return AnimePagination(**catalog.anime_pagination(animes, page, has_next_page))
 
-    return genres
+    return AnimePagination(**await fetch_genres_anime(id, page))
 
 
-@router.get("/genres/{id}", response_model=AnimePagination)
-@cache(expire=3600)
-async def get_genres_anime(id: str, page: int = 1):
-    html = httpx.get(
+@router.get("/genres/{id}/stream")
+async def get_genres_anime_stream(id: str, page: int = 1):
+    """Every anime of a genre from `page` on as newline delimited json, one
+    Anime per line."""
+    return ndjson(pages(anime_pages(get_genres_anime, id=id), page))
+
+
+async def fetch_genres_anime(id: str, page: int) -> dict:
+    html = await upstream.get(
         app_url + "/genres" + "/" + id + "/page" + "/" + str(page),
         follow_redirects=True,
     )
@@ -162,252 +134,164 @@ async def get_genres_anime(id: str, page: int = 1):
     ) and html.url != (app_url + "/genres" + "/" + id + "/"):
         raise HTTPException(status_code=404, detail="Genre not found")
 
-    soup = BeautifulSoup(html.text, "html.parser")
+    return await executor.parse(scraper.get_genres_anime, html.text, page)
 
-    animes = []
 
-    for anime in soup.find_all("div", class_="col-anime"):
-        id = (
-            anime.find("div", class_="col-anime-title").find("a")["href"].split("/")[-2]
-        )
-        title = anime.find("div", class_="col-anime-title").find("a").text
-        image = anime.find("img")["src"]
-        animes.append(
-            Anime(
-                id=id,
-                title=title,
-                episodes=None,
-                image=image,
-            )
-        )
-
-    pagination = soup.find("div", class_="pagination")
-    has_next_page = pagination.find("a", class_="next page-numbers") is not None
-    has_prev_page = pagination.find("a", class_="prev page-numbers") is not None
-
-    return AnimePagination(
-        animes=animes,
-        pagination=Pagination(
-            total_items=len(animes),
-            current_page=page,
-            has_next_page=has_next_page,
-            has_prev_page=has_prev_page,
-        ),
-    )
+@router.post("/batch", response_model=dict[str, BatchItem[AnimeDetail]])
+async def get_anime_batch(batch: BatchRequest):
+    """Details of several anime at once, keyed by id. An id that fails has an
+    error and status_code instead of a result."""
+    return await details(get_anime, batch.ids)
 
 
 @router.get("/{id}", response_model=AnimeDetail)
-@cache(expire=3600)
+@cache(expire=3600, namespace="otakudesu:anime")
+@upstream.deadline(config.ROUTE_DEADLINE)
 async def get_anime(id: str):
-    html = httpx.get(app_url + "/anime" + "/" + id, follow_redirects=True)
+    html = await upstream.get(app_url + "/anime" + "/" + id, follow_redirects=True)
 
     if html.url != app_url + "/anime/" + id:
         raise HTTPException(status_code=404, detail="Anime not found")
 
-    soup = BeautifulSoup(html.text, "html.parser")
+    anime = await executor.parse(scraper.get_anime, html.text, id)
+    await catalog.save_detail(scraper.source, anime)
 
-    info_section = soup.find("div", class_="infozingle")
+    return AnimeDetail(**anime)
 
-    title = info_section.find("b", text="Judul").parent.text.split(":")[1].strip()
-
-    japanese_title = (
-        info_section.find("b", text="Japanese").parent.text.split(":")[1].strip()
-    )
-
-    description = soup.find("div", class_="sinopc").text.strip()
-
-    image = soup.find("div", class_="fotoanime").find("img")["src"]
-
-    score = info_section.find("b", text="Skor").parent.text.split(":")[1].strip()
-
-    producers = (
-        info_section.find("b", text="Produser")
-        .parent.text.strip()
-        .split(":")[1]
-        .split(", ")
-    )
 
-    type = info_section.find("b", text="Tipe").parent.text.split(":")[1].strip()
-
-    status = info_section.find("b", text="Status").parent.text.split(":")[1].strip()
-
-    total_episodes = (
-        info_section.find("b", text="Total Episode").parent.text.split(":")[1].strip()
+@router.get("/{id}/episodes/{episode_id}", response_model=EpisodesDetail)
+@cache(expire=3600, namespace="otakudesu:episodes")
+@upstream.deadline(config.ROUTE_DEADLINE_SLOW)
+async def get_episode(id: str, episode_id: str):
+    html = await upstream.get(
+        app_url + "/episode/" + episode_id,
+        follow_redirects=True,
     )
 
-    duration = info_section.find("b", text="Durasi").parent.text.split(":")[1].strip()
+    if html.url != app_url + "/episode" + "/" + episode_id:
+        raise HTTPException(status_code=404, detail="Episode not found")
 
-    release_date = (
-        info_section.find("b", text="Tanggal Rilis").parent.text.split(":")[1].strip()
+    return EpisodesDetail(
+        **await executor.parse(scraper.get_episode, html.content, id, episode_id)
     )
 
-    studio = info_section.find("b", text="Studio").parent.text.split(":")[1].strip()
-
-    genres = []
-
-    genres_section = info_section.find("b", text="Genre").parent
-
-    for genre in genres_section.find_all("a"):
-        genre_id = genre["href"].split("/")[-2]
-        genre_name = genre.text.strip()
-        genres.append(Genre(id=genre_id, name=genre_name))
-
-    episodes = []
 
-    episodes_section = soup.find_all("div", class_="episodelist")
-    episodes_section = episodes_section[1]
-
-    for episode in episodes_section.find("ul").find_all("li"):
-        episode_id = episode.find("a")["href"].split("/")[-2]
-        # Extract the episode number after the word "episode"
-        episode_title = episode.find("a").text.strip().lower()
-        match = re.search(r"\bepisode\s+(\d+)\b", episode_title, re.IGNORECASE)
-
-        # If a match is found, extract the episode number; otherwise, use the full title
-        episode_number = match.group(1) if match else episode_title
-        episodes.append(Episodes(id=episode_id, title=episode_number))
-
-    recommendations = []
+@router.get("/{id}/servers/{server_id}", response_model=ServerDetail)
+@cache(expire=3600, namespace="otakudesu:servers")
+@upstream.deadline(config.ROUTE_DEADLINE_SLOW)
+async def get_server(id: str, server_id: str):
+    decode_server = json.loads(base64.b64decode(server_id).decode("utf-8"))
 
-    recommendations_section = soup.find("div", id="recommend-anime-series")
+    nonce = await get_nonce()
+    get_server = await post_server(nonce, decode_server)
 
-    for recommendation in recommendations_section.find_all("div", class_="isi-konten"):
-        recommendation_id = recommendation.find("a")["href"].split("/")[-2]
-        recommendation_title = recommendation.find(
-            "span", class_="judul-anime"
-        ).text.strip()
-        recommendation_image = recommendation.find("img")["src"]
-        recommendations.append(
-            Anime(
-                id=recommendation_id,
-                title=recommendation_title,
-                episodes=None,
-                image=recommendation_image,
-            )
-        )
+    if nonce_rejected(get_server):
+        # the cached nonce expired upstream before our ttl, retry once
+        nonce = await get_nonce(rejected=nonce)
+        get_server = await post_server(nonce, decode_server)
 
-    return AnimeDetail(
+    return ServerDetail(
         id=id,
-        title=title,
-        japanese_title=japanese_title,
-        description=description,
-        image=image,
-        score=score,
-        type=type,
-        status=status,
-        total_episodes=total_episodes,
-        duration=duration,
-        release_date=release_date,
-        producers=producers,
-        studio=studio,
-        genres=genres,
-        episodes=episodes,
-        recommendations=recommendations,
+        server_id=server_id,
+        url=scraper.get_server(get_server.json()["data"]),
     )
 
 
-@router.get("/{id}/episodes/{episode_id}", response_model=EpisodesDetail)
-@cache(expire=3600)
-async def get_episode(id: str, episode_id: str):
-    html = httpx.get(
-        app_url + "/episode/" + episode_id,
-        follow_redirects=True,
+async def post_server(nonce: str, decode_server: dict) -> httpx.Response:
+    return await upstream.post(
+        url=app_url + "/wp-admin/admin-ajax.php",
+        data={
+            "action": "2a3505c93b0035d3f455df82bf976b84",
+            "nonce": nonce,
+            "id": decode_server["id"],
+            "i": decode_server["i"],
+            "q": decode_server["q"],
+        },
     )
 
-    if html.url != app_url + "/episode" + "/" + episode_id:
-        raise HTTPException(status_code=404, detail="Episode not found")
-
-    soup = BeautifulSoup(html.content, "html.parser")
-
-    title = soup.find("h1", class_="posttl").text.strip()
-
-    default_stream_url = soup.find("div", class_="responsive-embed-stream").find(
-        "iframe"
-    )["src"]
-
-    quality = {}
 
-    servers_section = soup.find("div", class_="mirrorstream")
+def nonce_rejected(response: httpx.Response) -> bool:
+    if response.status_code in (400, 403):
+        return True
+    try:
+        data = response.json()
+    except ValueError:
+        return True
+    return not isinstance(data, dict) or "data" not in data
 
-    qualities = servers_section.find_all("ul")
-    for quality in qualities:
-        quality_name = quality.get("class")[0].replace("m", "")
-        servers = []
-        for server in quality.find_all("li"):
-            server_id = server.find("a")["data-content"]
-            server_name = server.text.strip().lower()
 
-            servers.append(
-                Server(
-                    id=server_id,
-                    name=server_name,
-                )
-            )
-        quality[quality_name] = servers
+async def get_nonce(rejected: str | None = None) -> str:
+    if nonce_usable(rejected):
+        return nonce
 
-    download_servers = {}
+    async with nonce_lock:
+        # another request may have refreshed it while we waited
+        if nonce_usable(rejected):
+            return nonce
+        return await load_nonce(rejected)
 
-    downloads_section = soup.find("div", class_="download")
 
-    for download in downloads_section.find_all("li"):
-        quality_name = download.find("strong").text.strip()
-        servers = []
-        for server in download.find_all("a"):
-            server_name = server.text.strip().lower()
-            server_url = server["href"]
+def nonce_usable(rejected: str | None) -> bool:
+    return (
+        nonce is not None and nonce != rejected and time.monotonic() < nonce_expires_at
+    )
 
-            servers.append(
-                Download(
-                    name=server_name,
-                    url=server_url,
-                )
-            )
-        download_servers[quality_name] = servers
 
-    return EpisodesDetail(
-        id=id,
-        episode_id=episode_id,
-        title=title,
-        default_stream_url=default_stream_url,
-        servers=quality,
-        downloads=download_servers,
-    )
+async def load_nonce(rejected: str | None = None, min_ttl: int = 0) -> str:
+    """Take the nonce another worker stored in the cache, or fetch a new one."""
+    global nonce, nonce_expires_at
 
+    key = FastAPICache.get_prefix() + ":otakudesu:nonce"
+    backend = FastAPICache.get_backend()
 
-@router.get("/{id}/servers/{server_id}", response_model=ServerDetail)
-@cache(expire=3600)
-async def get_server(id: str, server_id: str):
-    nonce = getNonce()
+    try:
+        ttl, cached = await backend.get_with_ttl(key)
+    except Exception:
+        logger.warning("Error reading otakudesu nonce from cache", exc_info=True)
+        ttl, cached = 0, None
 
-    decode_server = json.loads(base64.b64decode(server_id).decode("utf-8"))
+    if cached is not None and cached.decode("utf-8") != rejected and ttl > min_ttl:
+        nonce = cached.decode("utf-8")
+        nonce_expires_at = time.monotonic() + ttl
+        return nonce
 
-    get_server = httpx.post(
-        url=app_url + "/wp-admin/admin-ajax.php",
-        data={
-            "action": "2a3505c93b0035d3f455df82bf976b84",
-            "nonce": nonce["data"],
-            "id": decode_server["id"],
-            "i": decode_server["i"],
-            "q": decode_server["q"],
-        },
-    ).json()
+    fresh = (await getNonce())["data"]
 
-    html = base64.b64decode(get_server["data"]).decode("utf-8")
-    soup = BeautifulSoup(html, "html.parser")
+    try:
+        await backend.set(key, fresh.encode("utf-8"), config.OTAKUDESU_NONCE_TTL)
+    except Exception:
+        logger.warning("Error storing otakudesu nonce in cache", exc_info=True)
 
-    return ServerDetail(
-        id=id,
-        server_id=server_id,
-        url=soup.find("iframe")["src"],
-    )
+    nonce = fresh
+    nonce_expires_at = time.monotonic() + config.OTAKUDESU_NONCE_TTL
+    return nonce
 
 
-def getNonce() -> dict:
-    json = httpx.post(
-        url=app_url + "/wp-admin/admin-ajax.php",
-        data={
-            "action": "aa1208d27f29ca340c92c66d1926f13f",
-        },
+async def keep_nonce_fresh() -> None:
+    # refresh the nonce ahead of its expiry so requests never wait for it
+    while True:
+        try:
+            async with nonce_lock:
+                await load_nonce(min_ttl=config.OTAKUDESU_NONCE_REFRESH_AHEAD)
+            delay = (
+                nonce_expires_at
+                - time.monotonic()
+                - config.OTAKUDESU_NONCE_REFRESH_AHEAD
+            )
+        except Exception:
+            logger.warning("Error refreshing otakudesu nonce", exc_info=True)
+            delay = 60
+        await asyncio.sleep(max(delay, 1))
+
+
+async def getNonce() -> dict:
+    json = (
+        await upstream.post(
+            url=app_url + "/wp-admin/admin-ajax.php",
+            data={
+                "action": "aa1208d27f29ca340c92c66d1926f13f",
+            },
+        )
     ).json()
 
     return json
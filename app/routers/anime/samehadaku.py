@@ -1,532 +1,314 @@
+import asyncio
 import base64
 import json
-from collections.abc import AsyncIterator
-from contextlib import asynccontextmanager
+import logging
 from re import A
+from urllib.parse import quote_plus
 
 import httpx
 from annotated_types import T
-from bs4 import BeautifulSoup
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from fastapi_cache import FastAPICache
-from fastapi_cache.backends.redis import RedisBackend
-from fastapi_cache.decorator import cache
-from redis import asyncio as aioredis
-
+from starlette.status import HTTP_304_NOT_MODIFIED
+
+from app import config
+from app.core import backends, catalog, executor, index, upstream
+from app.core.batch import details
+from app.core.cache import cache, etag, not_modified, readable
+from app.core.search import from_prefix, normalize, remember, search_key
+from app.core.stream import anime_pages, ndjson, pages
 from app.models.anime import (
     Anime,
     AnimeDetail,
     AnimePagination,
-    Download,
-    Episodes,
     EpisodesDetail,
     Genre,
-    Pagination,
     Schedule,
-    Server,
     ServerDetail,
 )
+from app.models.batch import BatchItem, BatchRequest
+from app.scrapers import samehadaku as scraper
 
+logger = logging.getLogger(__name__)
 
-@asynccontextmanager
-async def lifespan(_: APIRouter) -> AsyncIterator[None]:
-    redis = aioredis.from_url("redis://localhost")
-    FastAPICache.init(RedisBackend(redis), prefix="fastapi-cache")
-    yield
-
-
-router = APIRouter(lifespan=lifespan)
+router = APIRouter()
 app_url = "https://samehadaku.mba"
-
-
-@cache()
-async def get_cache():
-    return 1
+days = [
+    "monday",
+    "tuesday",
+    "wednesday",
+    "thursday",
+    "friday",
+    "saturday",
+    "sunday",
+]
 
 
 @router.get("/search", response_model=list[Anime])
-@cache(expire=3600)
+@cache(
+    expire=config.SEARCH_CACHE_TTL,
+    stale=config.SEARCH_CACHE_STALE,
+    namespace="samehadaku:search",
+    key_builder=search_key,
+)
+@upstream.deadline(config.ROUTE_DEADLINE_SEARCH)
 async def search(query: str):
-    html = httpx.get(
-        app_url + "/page/1/?s=" + query,
-        follow_redirects=True,
-        timeout=30,
+    animes = index.search(scraper.source, query) or await from_prefix(
+        "samehadaku:search", query
     )
 
-    soup = BeautifulSoup(html.content, "html.parser")
-
-    animes = []
-
-    animes_section = soup.find("main", class_="site-main relat")
-
-    for anime in animes_section.find_all("div", class_="animepost"):
-        id = anime.find("a")["href"].split("/")[-2]
-        title = anime.find("h2").text.strip()
-        try:
-            image = anime.find("img")["src"]
-        except:
-            image = "https://placehold.co/400"
-        animes.append(
-            Anime(
-                id=id,
-                title=title,
-                episodes=None,
-                image=image,
-            )
+    if animes is None:
+        html = await upstream.get(
+            app_url + "/page/1/?s=" + quote_plus(normalize(query)),
+            follow_redirects=True,
         )
 
-    return animes
+        animes = await executor.parse(scraper.search, html.content)
+        await remember("samehadaku:search", query, animes)
+
+    return [Anime(**anime) for anime in animes]
 
 
 @router.get("/ongoing", response_model=AnimePagination)
-@cache(expire=3600)
+@cache(expire=3600, namespace="samehadaku:ongoing")
+@upstream.deadline(config.ROUTE_DEADLINE)
 async def ongoing(page: int = 1):
-    html = httpx.get(
+    html = await upstream.get(
         app_url + "/anime-terbaru" + "/page" + "/" + str(page),
         follow_redirects=True,
-        timeout=30,
     )
 
-    soup = BeautifulSoup(html.content, "html.parser")
+    return AnimePagination(**await executor.parse(scraper.ongoing, html.content, page))
 
-    animes = []
 
-    animes_section = soup.find("div", class_="post-show").find("ul")
-
-    for anime in animes_section.find_all("li"):
-        id = anime.find("a")["href"].split("/")[-2]
-        try:
-            episodes = int(anime.find("span").find("author").text.strip())
-        except (AttributeError, IndexError, ValueError):
-            episodes = None
-        title = anime.find("h2").text.strip()
-        try:
-            image = anime.find("img")["src"]
-            # anime_detail = await get_anime(id)
-            # image = anime_detail["image"]
-        except:
-            image = "https://placehold.co/400"
-        animes.append(
-            Anime(
-                id=id,
-                title=title,
-                episodes=episodes,
-                image=image,
-            )
-        )
+@router.get("/ongoing/stream")
+async def ongoing_stream(page: int = 1):
+    """Every ongoing anime from `page` on as newline delimited json, one
+    Anime per line."""
+    return ndjson(pages(anime_pages(ongoing), page))
 
-    pagination = soup.find("div", class_="pagination")
-    current_page = pagination.find("span", class_="page-numbers current")
-    has_next_page = current_page.find_next_sibling("a") is not None
-    has_prev_page = current_page.find_previous_sibling("a") is not None
 
-    return AnimePagination(
-        animes=animes,
-        pagination=Pagination(
-            total_items=len(animes),
-            current_page=page,
-            has_next_page=has_next_page,
-            has_prev_page=has_prev_page,
-        ),
+@router.get("/schedule", response_model=list[Schedule])
+@upstream.deadline(config.ROUTE_DEADLINE_SLOW)
+async def schedule(request: Request, response: Response):
+    """The schedule of every day of the week.
+
+    Days are cached on their own with stale-while-revalidate, a day that
+    fails without a cached copy comes back with an error instead of failing
+    the week.
+    """
+    cached = await cached_schedule()
+    limit = asyncio.Semaphore(config.SCHEDULE_CONCURRENCY)
+    missing = [day for day in days if day not in cached]
+    fetched = dict(
+        zip(
+            missing,
+            await asyncio.gather(*(get_schedule_day(day, limit) for day in missing)),
+        )
     )
 
+    # the week is as fresh as its stalest day, failed days are not cached
+    max_age = min(
+        [max(ttl - config.CACHE_STALE_TTL, 0) for ttl, _ in cached.values()]
+        + [3600 if day.error is None else 0 for day in fetched.values()]
+    )
+    week = [cached[day][1] if day in cached else fetched[day] for day in days]
 
-@router.get("/schedule", response_model=list[Schedule])
-@cache(expire=3600)
-async def schedule():
-    days = [
-        "monday",
-        "tuesday",
-        "wednesday",
-        "thursday",
-        "friday",
-        "saturday",
-        "sunday",
-    ]
-
-    schedule = []
-
-    for day in days:
-        animes_json = httpx.get(
-            f"https://samehadaku.mba/wp-json/custom/v1/all-schedule?perpage=20&day={day}&type=schtml",
-            follow_redirects=True,
-            timeout=30,
-        ).json()
+    coder = FastAPICache.get_coder()
+    tag = etag(coder, coder.encode(week))
+    response.headers.update({"Cache-Control": f"max-age={max_age}", "ETag": tag})
+    if not_modified(request, tag):
+        response.status_code = HTTP_304_NOT_MODIFIED
+        return response
 
-        animes = []
+    return week
 
-        for anime_json in animes_json:
 
-            animes.append(
-                Anime(
-                    id=anime_json["slug"],
-                    title=anime_json["title"],
-                    episodes=None,
-                    image=anime_json["featured_img_src"] or "https://placehold.co/400",
-                )
-            )
+async def cached_schedule() -> dict[str, tuple[int, Schedule]]:
+    # every cached day out of one multi-get, stale ones are refreshed in the
+    # background like schedule_day would
+    if not FastAPICache.get_enable():
+        return {}
 
-        schedule.append(
-            Schedule(
-                day=day,
-                animes=animes,
-            )
+    coder = FastAPICache.get_coder()
+    try:
+        entries = await backends.get_many_with_ttl(
+            [schedule_day.key(day=day) for day in days]
         )
+    except Exception:
+        logger.warning("Error reading the cached schedule", exc_info=True)
+        return {}
 
-    return schedule
-
-
-@router.get("/genres", response_model=list[Genre])
-@cache(expire=3600)
-async def genres():
-    html = httpx.get(
-        app_url + "/daftar-anime-2",
-        follow_redirects=True,
-        timeout=30,
-    )
-
-    soup = BeautifulSoup(html.text, "html.parser")
-
-    genres = []
+    cached = {}
+    for day, (ttl, data) in zip(days, entries):
+        if readable(coder, data):
+            cached[day] = (ttl, Schedule(**coder.decode(data)))
+            schedule_day.refresh(ttl, day=day)
+    return cached
 
-    genres_section = soup.find("td", class_="filter_act genres")
 
-    for genre in genres_section.find_all("label", class_="tax_fil"):
-        id = genre.find("input")["value"]
-        name = genre.text.strip()
-        genres.append(
-            Genre(
-                id=id,
-                name=name,
-            )
+async def get_schedule_day(day: str, limit: asyncio.Semaphore) -> Schedule:
+    try:
+        async with limit:
+            return Schedule.model_validate(await schedule_day(day=day))
+    except (httpx.HTTPError, HTTPException, ValueError) as e:
+        # HTTPException is the route deadline or an open circuit running out
+        # on this day, the days already fetched are still answered
+        return Schedule(
+            day=day, animes=[], error=f"Failed to fetch schedule: {type(e).__name__}"
         )
 
-    return genres
 
-
-@router.get("/genres/{id}", response_model=AnimePagination)
-@cache(expire=3600)
-async def genres_anime(id: str, page: int = 1):
-    html = httpx.get(
-        app_url + "/genre/" + id + "/page/" + str(page),
+@cache(expire=3600, namespace="samehadaku:schedule")
+@upstream.deadline(config.ROUTE_DEADLINE)
+async def schedule_day(day: str):
+    # every day is cached on its own so a failed day does not invalidate the
+    # rest of the week, failures raise and are not cached
+    response = await upstream.get(
+        f"https://samehadaku.mba/wp-json/custom/v1/all-schedule?perpage=20&day={day}&type=schtml",
         follow_redirects=True,
-        timeout=30,
     )
-
-    if html.url != (
-        app_url + "/genre" + "/" + id + "/page" + "/" + str(page) + "/"
-    ) and html.url != (app_url + "/genre" + "/" + id + "/"):
-        raise HTTPException(status_code=404, detail="Genre not found")
-
-    soup = BeautifulSoup(html.text, "html.parser")
+    response.raise_for_status()
 
     animes = []
 
-    animes_section = soup.find("div", class_="relat")
-
-    for anime in animes_section.find_all("div", class_="animepost"):
-        id = anime.find("a")["href"].split("/")[-2]
-        title = anime.find("h2").text.strip()
-        try:
-            image = anime.find("img")["src"]
-        except:
-            image = "https://placehold.co/400"
+    for anime_json in response.json():
         animes.append(
             Anime(
-                id=id,
-                title=title,
+                id=anime_json["slug"],
+                title=anime_json["title"],
                 episodes=None,
-                image=image,
+                image=anime_json["featured_img_src"] or "https://placehold.co/400",
             )
         )
 
-    pagination = soup.find("div", class_="pagination")
-    current_page = pagination.find("span", class_="page-numbers current")
-    has_next_page = current_page.find_next_sibling("a") is not None
-    has_prev_page = current_page.find_previous_sibling("a") is not None
-
-    return AnimePagination(
+    return Schedule(
+        day=day,
         animes=animes,
-        pagination=Pagination(
-            total_items=len(animes),
-            current_page=page,
-            has_next_page=has_next_page,
-            has_prev_page=has_prev_page,
-        ),
     )
 
 
-@router.get("/{id}", response_model=AnimeDetail)
-@cache(expire=3600)
-async def get_anime(id: str):
-    html = httpx.get(
-        app_url + "/anime" + "/" + id,
+@router.get("/genres", response_model=list[Genre])
+@cache(expire=3600, namespace="samehadaku:genres")
+@upstream.deadline(config.ROUTE_DEADLINE)
+async def genres():
+    html = await upstream.get(
+        app_url + "/daftar-anime-2",
         follow_redirects=True,
-        timeout=30,
     )
 
-    if html.url != app_url + "/anime/" + id + "/":
-        raise HTTPException(status_code=404, detail="Anime not found")
+    genres = await executor.parse(scraper.genres, html.text)
 
-    soup = BeautifulSoup(html.text, "html.parser")
+    return [Genre(**genre) for genre in genres]
 
-    title = (
-        soup.find("h3", class_="anim-detail")
-        .text.strip()
-        .replace("Detail Anime ", "")
-        .strip()
-    )
 
-    info_section = soup.find("div", class_="spe")
+@router.get("/genres/{id}", response_model=AnimePagination)
+@cache(expire=3600, namespace="samehadaku:genres")
+@upstream.deadline(config.ROUTE_DEADLINE)
+async def genres_anime(id: str, page: int = 1):
+    local = await catalog.listing(scraper.source, "genre:" + id, page)
+    if local is not None:
+        animes, has_next_page = local
+        return AnimePagination(**catalog.anime_pagination(animes, page, has_next_page))
 
-    japanese_title = (
-        soup.find("b", text="Japanese")
-        .parent.text.strip()
-        .replace("Japanese", "")
-        .strip()
-    )
+    return AnimePagination(**await fetch_genres_anime(id, page))
 
-    description = (
-        soup.find("div", class_="infox").find("div", class_="desc").text.strip()
-    )
 
-    try:
-        image = soup.find("div", class_="thumb").find("img")["src"]
-    except:
-        image = "https://placehold.co/400"
+@router.get("/genres/{id}/stream")
+async def genres_anime_stream(id: str, page: int = 1):
+    """Every anime of a genre from `page` on as newline delimited json, one
+    Anime per line."""
+    return ndjson(pages(anime_pages(genres_anime, id=id), page))
 
-    try:
-        score = soup.find("span", attrs={"itemprop": "ratingValue"}).text.strip()
-    except:
-        score = "0"
-
-    producers = (
-        info_section.find("b", text="Producers")
-        .parent.text.strip()
-        .replace("Producers", "")
-        .strip()
-        .split(", ")
-    )
 
-    type = (
-        info_section.find("b", text="Type")
-        .parent.text.strip()
-        .replace("Type", "")
-        .strip()
+async def fetch_genres_anime(id: str, page: int) -> dict:
+    html = await upstream.get(
+        app_url + "/genre/" + id + "/page/" + str(page),
+        follow_redirects=True,
     )
 
-    status = (
-        info_section.find("b", text="Status")
-        .parent.text.strip()
-        .replace("Status", "")
-        .strip()
-    )
+    if html.url != (
+        app_url + "/genre" + "/" + id + "/page" + "/" + str(page) + "/"
+    ) and html.url != (app_url + "/genre" + "/" + id + "/"):
+        raise HTTPException(status_code=404, detail="Genre not found")
 
-    total_episodes = (
-        info_section.find("b", text="Total Episode")
-        .parent.text.strip()
-        .replace("Total Episode", "")
-        .strip()
-        or "1"
-    )
+    return await executor.parse(scraper.genres_anime, html.text, page)
 
-    duration = (
-        info_section.find("b", text="Duration")
-        .parent.text.strip()
-        .replace("Duration", "")
-        .strip()
-        or "0 m"
-    )
 
-    release_date = (
-        info_section.find("b", text="Released:")
-        .parent.text.strip()
-        .replace("Released:", "")
-        .strip()
-    )
+@router.post("/batch", response_model=dict[str, BatchItem[AnimeDetail]])
+async def get_anime_batch(batch: BatchRequest):
+    """Details of several anime at once, keyed by id. An id that fails has an
+    error and status_code instead of a result."""
+    return await details(get_anime, batch.ids)
 
-    season = (
-        info_section.find("b", text="Season")
-        .parent.text.strip()
-        .replace("Season", "")
-        .strip()
-    )
 
-    studio = (
-        info_section.find("b", text="Studio")
-        .parent.text.strip()
-        .replace("Studio", "")
-        .strip()
+@router.get("/{id}", response_model=AnimeDetail)
+@cache(expire=3600, namespace="samehadaku:anime")
+@upstream.deadline(config.ROUTE_DEADLINE)
+async def get_anime(id: str):
+    html = await upstream.get(
+        app_url + "/anime" + "/" + id,
+        follow_redirects=True,
     )
 
-    genres = []
-
-    genres_section = soup.find("div", class_="genre-info")
-
-    for genre in genres_section.find_all("a"):
-        genre_id = genre["href"].split("/")[-1]
-        genre_name = genre.text.strip()
-        genres.append(Genre(id=genre_id, name=genre_name))
-
-    episodes = []
-
-    episodes_section = soup.find("div", class_="lstepsiode listeps").find("ul")
+    if html.url != app_url + "/anime/" + id + "/":
+        raise HTTPException(status_code=404, detail="Anime not found")
 
-    for episode in episodes_section.find_all("li"):
-        episode_id = episode.find("a")["href"].split("/")[-2]
-        episode_title = episode.find("div", class_="epsright").text.strip()
-        episodes.append(Episodes(id=episode_id, title=episode_title))
+    anime = await executor.parse(scraper.get_anime, html.text, id)
+    await catalog.save_detail(scraper.source, anime)
 
-    recommendations = []
-
-    recommendations_section = soup.find("div", class_="rand-animesu").find("ul")
-
-    for recommendation in recommendations_section.find_all("li"):
-        recommendation_id = recommendation.find("a")["href"].split("/")[-2]
-        recommendation_title = recommendation.find("span", class_="judul").text.strip()
-        recommendation_episodes = (
-            recommendation.find("span", class_="episode")
-            .text.strip()
-            .replace("Eps", "")
-            .strip()
-        )
-        try:
-            recommendation_image = recommendation.find("img")["src"]
-        except:
-            recommendation_image = "https://placehold.co/400"
-        recommendations.append(
-            Anime(
-                id=recommendation_id,
-                title=recommendation_title,
-                episodes=None,
-                image=recommendation_image,
-            )
-        )
-
-    return AnimeDetail(
-        id=id,
-        title=title,
-        japanese_title=japanese_title,
-        description=description,
-        image=image,
-        score=score,
-        type=type,
-        status=status,
-        total_episodes=total_episodes,
-        duration=duration,
-        release_date=release_date,
-        season=season,
-        producers=producers,
-        studio=studio,
-        genres=genres,
-        episodes=episodes,
-        recommendations=recommendations,
-    )
+    return AnimeDetail(**anime)
 
 
 @router.get("/{id}/episodes/{episode_id}", response_model=EpisodesDetail)
-@cache(expire=3600)
-async def get_episode(id: str, episode_id: str):
-    html = httpx.get(
+@cache(expire=3600, namespace="samehadaku:episodes")
+@upstream.deadline(config.ROUTE_DEADLINE_SLOW)
+async def get_episode(id: str, episode_id: str, resolve_stream: bool = True):
+    """Episode detail with its stream servers and download links.
+
+    With resolve_stream=false the default stream is not resolved,
+    default_stream_url is null and the client resolves default_server_id
+    through the servers endpoint when it actually plays the episode.
+    """
+    html = await upstream.get(
         app_url + "/" + episode_id,
         follow_redirects=True,
-        timeout=30,
     )
 
     if html.url != app_url + "/" + episode_id + "/":
         raise HTTPException(status_code=404, detail="Episode not found")
 
-    soup = BeautifulSoup(html.content, "html.parser")
-
-    title = soup.find("h1", class_="entry-title").text.strip()
-
-    # Initialize the result dictionary
-    quality = {}
-
-    # Iterate through each server option
-    for server in soup.find_all("div", class_="east_player_option"):
-        server_post_id = server.get("data-post")
-        server_nume = server.get("data-nume")
-        server_type = server.get("data-type")
-
-        server_id = base64.b64encode(
-            json.dumps(
-                {
-                    "post": server_post_id,
-                    "nume": server_nume,
-                    "type": server_type,
-                }
-            ).encode("utf-8")
-        ).decode("utf-8")
-
-        # Extract the text inside the <span> tag
-        server_text = server.find("span").text.strip()
-
-        # Split the text into server name and quality
-        parts = server_text.split()
-        server_name = " ".join(parts[:-1])  # Everything except the last part
-        quality_value = parts[-1]  # The last part is the quality
-
-        # Check if the server is disabled
-        is_disabled = "pointer-events: none" in server.get(
-            "style", ""
-        ) or "text-decoration: line-through" in server.find("span").get("style", "")
-
-        # Skip disabled options
-        if is_disabled:
-            continue
-
-        # Initialize the quality key as a list if it doesn't exist
-        if quality_value not in quality:
-            quality[quality_value] = []
-
-        # Append the Server object to the list
-        quality[quality_value].append(
-            Server(
-                id=server_id,
-                name=server_name,
-            )
-        )
+    episode = await executor.parse(scraper.get_episode_servers, html.content)
 
+    quality = episode["servers"]
     first_quality = next(iter(quality), None)
-    if first_quality:
-        first_server = quality[first_quality][0]
-    default_stream_url = get_server_url(first_server.id)
-
-    download_servers = {}
-
-    format_section = soup.find_all("div", class_="download-eps")
-
-    for format in format_section:
-        for download in format.find_all("li"):
-            quality_name = download.find("strong").text.strip()
-            servers = []
-            for server in download.find_all("a"):
-                server_name = server.text.strip().lower()
-                server_url = server["href"]
-
-                servers.append(
-                    Download(
-                        name=server_name,
-                        url=server_url,
-                    )
-                )
-            download_servers[quality_name] = servers
+    default_server_id = quality[first_quality][0]["id"] if first_quality else None
+
+    # resolve the default stream while the download links are extracted
+    downloads = executor.parse(scraper.get_episode_downloads, html.content)
+    if resolve_stream and default_server_id:
+        default_stream_url, downloads = await asyncio.gather(
+            get_server_url(default_server_id), downloads
+        )
+    else:
+        default_stream_url, downloads = None, await downloads
 
     return EpisodesDetail(
         id=id,
         episode_id=episode_id,
-        title=title,
+        title=episode["title"],
         default_stream_url=default_stream_url,
+        default_server_id=default_server_id,
         servers=quality,
-        downloads=download_servers,
+        downloads=downloads,
     )
 
 
 @router.get("/{id}/servers/{server_id}", response_model=ServerDetail)
-@cache(expire=3600)
+@cache(expire=3600, namespace="samehadaku:servers")
+@upstream.deadline(config.ROUTE_DEADLINE_SLOW)
 async def get_server(id: str, server_id: str):
-    server_url = get_server_url(server_id)
+    server_url = await get_server_url(server_id)
 
     return ServerDetail(
         id=id,
@@ -535,14 +317,28 @@ async def get_server(id: str, server_id: str):
     )
 
 
-def get_server_url(server_id: str) -> str:
+async def get_server_url(server_id: str) -> str:
+    # embeds are cached per server so the episode page and the servers
+    # endpoint share one player_ajax call
+    key = FastAPICache.get_prefix() + ":samehadaku:server:" + server_id
+    backend = FastAPICache.get_backend()
+
+    if FastAPICache.get_enable():
+        try:
+            cached = await backend.get(key)
+        except Exception:
+            logger.warning("Error reading samehadaku server from cache", exc_info=True)
+            cached = None
+        if cached is not None:
+            return cached.decode("utf-8")
+
     # decode server_id
     decode_server = json.loads(base64.b64decode(server_id).decode("utf-8"))
     server_post_id = decode_server["post"]
     server_nume = decode_server["nume"]
     server_type = decode_server["type"]
 
-    get_server = httpx.post(
+    get_server = await upstream.post(
         url=app_url + "/wp-admin/admin-ajax.php",
         data={
             "action": "player_ajax",
@@ -552,6 +348,12 @@ def get_server_url(server_id: str) -> str:
         },
     )
 
-    soup = BeautifulSoup(get_server.text, "html.parser")
+    server_url = scraper.get_server(get_server.text)
+
+    if FastAPICache.get_enable():
+        try:
+            await backend.set(key, server_url.encode("utf-8"), 3600)
+        except Exception:
+            logger.warning("Error storing samehadaku server in cache", exc_info=True)
 
-    return soup.find("iframe")["src"]
+    return server_url
@@ -0,0 +1,45 @@
+from typing import Literal
+from urllib.parse import quote
+
+from fastapi import APIRouter
+from fastapi_cache import FastAPICache
+
+from app.core import backends
+
+router = APIRouter()
+
+
+@router.post("/invalidate")
+async def invalidate(
+    namespace: Literal["otakudesu", "samehadaku", "manga", "news"],
+    route: str | None = None,
+    id: str | None = None,
+):
+    """Drop the cached responses of a source, one of its routes or one id.
+
+    Routes are the first path segment after the source (ongoing, genres,
+    anime, episodes, servers, search, manga, chapters, ...). An id without a
+    route drops every entry of the source cached for that id, e.g. the anime
+    and all of its episodes.
+    """
+    patterns = keys(namespace, route, id)
+
+    deleted = 0
+    for pattern in patterns:
+        deleted += await backends.delete_matching(pattern)
+
+    return {"patterns": patterns, "deleted": deleted}
+
+
+def keys(namespace: str, route: str | None, id: str | None) -> list[str]:
+    base = FastAPICache.get_prefix() + ":" + namespace
+    if route:
+        base += ":" + quote(route, safe="")
+
+    if id is None:
+        return [base, base + ":*"]
+
+    id = quote(id, safe="")
+    if route:
+        return [base + ":" + id, base + ":" + id + ":*"]
+    return [base + ":*:" + id, base + ":*:" + id + ":*"]
@@ -0,0 +1,37 @@
+from typing import Literal
+
+from fastapi import APIRouter, Query, Request, Response
+from fastapi.responses import FileResponse
+
+from app import config
+from app.core import image_cache
+from app.core.cache import not_modified
+
+router = APIRouter()
+
+
+@router.get("")
+async def get_image(
+    url: str,
+    request: Request,
+    width: int | None = Query(None, ge=16, le=config.IMAGE_MAX_WIDTH),
+    quality: int = Query(80, ge=1, le=100),
+    format: Literal["webp", "avif", "jpeg", "png"] | None = None,
+):
+    """Proxy an image of one of the scraped sites through the local image
+    cache, e.g. the image of an anime or the pages of a manga chapter.
+
+    With `width` the image is scaled down to it and with `format` converted,
+    e.g. `width=320&format=webp` for list thumbnails. Answers Range requests
+    and 304 for an If-None-Match of its ETag.
+    """
+    image = await image_cache.get(url, width, quality, format)
+    headers = {
+        "ETag": image.etag,
+        "Cache-Control": f"public, max-age={config.IMAGE_MAX_AGE}",
+    }
+
+    if not_modified(request, image.etag):
+        return Response(status_code=304, headers=headers)
+
+    return FileResponse(image.path, media_type=image.content_type, headers=headers)
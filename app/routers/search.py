@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator
+
+from fastapi import APIRouter
+from fastapi.encoders import jsonable_encoder
+
+from app import config
+from app.core import index
+from app.core.stream import ndjson
+from app.models.search import SearchResults
+from app.routers import manga
+from app.routers.anime import otakudesu, samehadaku
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# source -> (kind of its results, its cached search route)
+sources = {
+    "otakudesu": ("animes", otakudesu.search),
+    "samehadaku": ("animes", samehadaku.search),
+    "manga": ("mangas", manga.search),
+}
+
+
+@router.get("", response_model=SearchResults)
+async def search(query: str):
+    """Search every source at once.
+
+    Sources that have not answered within SEARCH_DEADLINE seconds are left
+    out with a "timeout" status, a failing source with "error". An anime
+    found on both anime sources is listed once, from whichever answered
+    first.
+    """
+    results = {"animes": [], "mangas": [], "sources": {}}
+    async for event in fan_out(query):
+        results[event["kind"]].extend(event["results"])
+        results["sources"][event["source"]] = status(event)
+    return results
+
+
+@router.get("/stream")
+async def search_stream(query: str):
+    """The same search as newline delimited json, one line per source as
+    soon as it answers:
+
+        {"source": "manga", "kind": "mangas", "status": "ok", "results": [...]}
+    """
+
+    return ndjson(fan_out(query))
+
+
+def status(event: dict) -> dict:
+    return {"status": event["status"], "total_items": len(event["results"])}
+
+
+async def fan_out(query: str) -> AsyncIterator[dict]:
+    """Yield the results of every source as they arrive, until the deadline."""
+    deadline = time.monotonic() + config.SEARCH_DEADLINE
+    tasks = {
+        asyncio.create_task(route(query=query)): (source, kind)
+        for source, (kind, route) in sources.items()
+    }
+    seen = set()
+
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=max(deadline - time.monotonic(), 0),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                break
+
+            for task in done:
+                source, kind = tasks[task]
+                event = {"source": source, "kind": kind, "status": "ok", "results": []}
+                try:
+                    results = jsonable_encoder(task.result())
+                    # only the two anime sources overlap
+                    event["results"] = (
+                        unique(results, seen) if kind == "animes" else results
+                    )
+                except Exception:
+                    logger.warning("Error searching %s", source, exc_info=True)
+                    event["status"] = "error"
+                yield event
+
+        for task in pending:
+            source, kind = tasks[task]
+            yield {"source": source, "kind": kind, "status": "timeout", "results": []}
+    finally:
+        # the cached routes keep loading in the background, a timed out
+        # source is usually a cache hit on the next search
+        for task in tasks:
+            task.cancel()
+
+
+def unique(results: list[dict], seen: set[str]) -> list[dict]:
+    kept = []
+    for result in results:
+        title = index.normalize(result["title"])
+        if title in seen:
+            continue
+        seen.add(title)
+        kept.append(result)
+    return kept
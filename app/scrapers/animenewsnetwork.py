@@ -0,0 +1,118 @@
+import base64
+from datetime import datetime, timedelta, timezone
+
+from app.core import parser
+
+source = "animenewsnetwork"
+
+cdn_url = "https://cdn.animenewsnetwork.com"
+
+
+def format_published_at(published_at: str) -> str:
+    dt = datetime.fromisoformat(published_at)
+    tz = timezone(timedelta(hours=7))
+    dt_tz = dt.astimezone(tz)
+    return dt_tz.strftime("%d %B %Y, %H:%M")
+
+
+get_recent_news_only = parser.only("div", "herald")
+
+
+def get_recent_news(html: bytes) -> list[dict]:
+    if parser.use_lexbor(source):
+        return get_recent_news_lexbor(html)
+
+    soup = parser.soup(html, source, get_recent_news_only)
+
+    news = []
+
+    for news_item in soup.select("div.herald.box"):
+        id = base64.b64encode(
+            news_item.find("h3").find("a")["href"].replace("/news/", "").encode("utf-8")
+        ).decode("utf-8")
+        title = news_item.find("h3").text.strip()
+        category = news_item.find("div", class_="category").text.strip()
+        description = news_item.find("div", class_="snippet").text.strip()
+        image = cdn_url + news_item.find("div", class_="thumbnail")["data-src"]
+        # parse datetime
+        published_at = format_published_at(news_item.find("time")["datetime"])
+
+        if category == "news":
+            news.append(
+                {
+                    "id": id,
+                    "title": title,
+                    "description": description,
+                    "category": category,
+                    "image": image,
+                    "published_at": published_at,
+                }
+            )
+
+    return news
+
+
+def get_recent_news_lexbor(html: bytes) -> list[dict]:
+    tree = parser.tree(html)
+
+    news = []
+
+    for news_item in tree.css("div.herald.box"):
+        id = base64.b64encode(
+            news_item.css_first("h3")
+            .css_first("a")
+            .attributes["href"]
+            .replace("/news/", "")
+            .encode("utf-8")
+        ).decode("utf-8")
+        title = news_item.css_first("h3").text().strip()
+        category = news_item.css_first("div.category").text().strip()
+        description = news_item.css_first("div.snippet").text().strip()
+        image = cdn_url + news_item.css_first("div.thumbnail").attributes["data-src"]
+        # parse datetime
+        published_at = format_published_at(
+            news_item.css_first("time").attributes["datetime"]
+        )
+
+        if category == "news":
+            news.append(
+                {
+                    "id": id,
+                    "title": title,
+                    "description": description,
+                    "category": category,
+                    "image": image,
+                    "published_at": published_at,
+                }
+            )
+
+    return news
+
+
+def get_news(html: bytes, id: str) -> dict:
+    soup = parser.soup(html, source)
+
+    title = soup.find("h1").text.strip().replace("News\n", "")
+
+    description = soup.find("div", class_="meat")
+
+    for img_tag in description.find_all("img"):
+        if img_tag.has_attr("data-src"):
+            img_tag["src"] = cdn_url + img_tag["data-src"]
+            del img_tag["data-src"]
+
+    description = description.prettify()
+
+    image = cdn_url + soup.find("div", class_="meat").find("img")["src"]
+
+    # parse datetime
+    published_at = format_published_at(soup.find("time")["datetime"])
+
+    return {
+        "id": id,
+        "title": title,
+        "description": description,
+        "category": "news",
+        "image": image,
+        "published_at": published_at,
+    }
@@ -0,0 +1,175 @@
+from app.core import parser
+
+source = "komiku"
+
+
+mangas_only = parser.only("div", "bge")
+
+
+def mangas(html: bytes) -> list[dict]:
+    if parser.use_lexbor(source):
+        return mangas_lexbor(html)
+
+    soup = parser.soup(html, source, mangas_only)
+
+    mangas = []
+
+    for manga in soup.find_all("div", class_="bge"):
+        id = manga.find("a")["href"].split("/")[-2]
+        title = manga.find("h3").text.strip()
+        description = manga.find("p").text.strip()
+        image = manga.find("img")["src"].split("?")[0]
+        genre = manga.find("div", class_="tpe1_inf").text.strip().split(" ")[-1]
+        genre_id = genre.lower().replace(" ", "-")
+        main_genre = {"id": genre_id, "name": genre}
+
+        mangas.append(
+            {
+                "id": id,
+                "title": title,
+                "description": description,
+                "main_genre": main_genre,
+                "image": image,
+            }
+        )
+
+    return mangas
+
+
+def mangas_lexbor(html: bytes) -> list[dict]:
+    tree = parser.tree(html)
+
+    mangas = []
+
+    for manga in tree.css("div.bge"):
+        id = manga.css_first("a").attributes["href"].split("/")[-2]
+        title = manga.css_first("h3").text().strip()
+        description = manga.css_first("p").text().strip()
+        image = manga.css_first("img").attributes["src"].split("?")[0]
+        genre = manga.css_first("div.tpe1_inf").text().strip().split(" ")[-1]
+        genre_id = genre.lower().replace(" ", "-")
+        main_genre = {"id": genre_id, "name": genre}
+
+        mangas.append(
+            {
+                "id": id,
+                "title": title,
+                "description": description,
+                "main_genre": main_genre,
+                "image": image,
+            }
+        )
+
+    return mangas
+
+
+get_genres_only = parser.only("ul", "genre")
+
+
+def get_genres(html: str) -> list[dict]:
+    soup = parser.soup(html, source, get_genres_only)
+
+    genres = []
+
+    for genre in soup.find("ul", class_="genre").find_all("li"):
+        id = genre.find("a")["href"].split("/")[-2]
+        name = genre.find("a").text.strip()
+        genres.append(
+            {
+                "id": id,
+                "name": name,
+            }
+        )
+
+    return genres
+
+
+def get_manga(html: bytes, id: str) -> dict:
+    soup = parser.soup(html, source)
+
+    title_tag = soup.find("td", text="Judul Komik")
+    title = title_tag.find_next_sibling("td").text.strip()
+
+    description = soup.find("p", class_="desc").text.strip()
+
+    author_tag = soup.find("td", text="Pengarang")
+    author = author_tag.find_next_sibling("td").text.strip()
+
+    status_tag = soup.find("td", text="Status")
+    status = status_tag.find_next_sibling("td").text.strip()
+
+    image = soup.find("section", id="Informasi").find("img")["src"].split("?")[0]
+
+    genres = []
+
+    genres_section = soup.find("ul", class_="genre")
+
+    for genre in genres_section.find_all("li"):
+        genre_id = genre.find("a")["href"].split("/")[-2]
+        genre_name = genre.find("a").text.strip()
+        genres.append({"id": genre_id, "name": genre_name})
+
+    chapters = []
+
+    chapters_section = soup.find("table", id="Daftar_Chapter")
+
+    for chapter in chapters_section.find_all("tr")[1:]:
+        chapter_id = chapter.find("a")["href"].split("/")[-2]
+        chapter_title = chapter.find("a").text.strip()
+        date = chapter.find("td", class_="tanggalseries").text.strip()
+        chapters.append({"id": chapter_id, "title": chapter_title, "date": date})
+
+    recommendations = []
+
+    recommendation_section = soup.find("section", id="Spoiler")
+
+    for recommendation in recommendation_section.find_all("div", class_="grd"):
+        recommendation_id = recommendation.find("a")["href"].split("/")[-2]
+        recommendation_title = recommendation.find("div", class_="h4").text.strip()
+        recommendation_description = recommendation.find("p").text.strip()
+        recommendation_image = recommendation.find("img")["data-src"].split("?")[0]
+        genre = (
+            recommendation.find("div", class_="tpe1_inf").text.strip().split(" ")[-1]
+        )
+        genre_id = genre.lower().replace(" ", "-")
+        main_genre = {"id": genre_id, "name": genre}
+        recommendations.append(
+            {
+                "id": recommendation_id,
+                "title": recommendation_title,
+                "description": recommendation_description,
+                "main_genre": main_genre,
+                "image": recommendation_image,
+            }
+        )
+
+    return {
+        "id": id,
+        "title": title,
+        "description": description,
+        "author": author,
+        "status": status,
+        "image": image,
+        "genres": genres,
+        "chapters": chapters,
+        "recommendations": recommendations,
+    }
+
+
+def get_chapter(html: str, chapter_id: str) -> dict:
+    soup = parser.soup(html, source)
+
+    title_tag = soup.find("td", text="Judul")
+    title = title_tag.find_next_sibling("td").text.strip()
+
+    date_tag = soup.find("td", text="Tanggal Rilis")
+    date = date_tag.find_next_sibling("td").text.strip()
+
+    pages = []
+
+    for page in soup.find_all("img", class_="ww"):
+        page_number = page["id"]
+        image = page["src"]
+        pages.append({"page_number": page_number, "image": image})
+
+    return {"id": chapter_id, "title": title, "date": date, "pages": pages}
@@ -0,0 +1,417 @@
+import base64
+import re
+
+from app.core import parser
+
+source = "otakudesu"
+
+
+search_only = parser.only("ul", "chivsrc")
+
+
+def search(html: bytes) -> list[dict]:
+    if parser.use_lexbor(source):
+        return search_lexbor(html)
+
+    soup = parser.soup(html, source, search_only)
+
+    animes = []
+
+    animes_section = soup.find("ul", class_="chivsrc")
+
+    for anime in animes_section.find_all("li"):
+        id = anime.find("a")["href"].split("/")[-2]
+        title = re.sub(
+            r"\s+",
+            " ",
+            re.sub(r"\(.*?\)", "", anime.find("h2").text)
+            .replace("Subtitle Indonesia", "")
+            .strip(),
+        )
+        image = anime.find("img")["src"]
+        animes.append(
+            {
+                "id": id,
+                "title": title,
+                "episodes": None,
+                "image": image,
+            }
+        )
+
+    return animes
+
+
+def search_lexbor(html: bytes) -> list[dict]:
+    tree = parser.tree(html)
+
+    animes = []
+
+    for anime in tree.css_first("ul.chivsrc").css("li"):
+        id = anime.css_first("a").attributes["href"].split("/")[-2]
+        title = re.sub(
+            r"\s+",
+            " ",
+            re.sub(r"\(.*?\)", "", anime.css_first("h2").text())
+            .replace("Subtitle Indonesia", "")
+            .strip(),
+        )
+        image = anime.css_first("img").attributes["src"]
+        animes.append(
+            {
+                "id": id,
+                "title": title,
+                "episodes": None,
+                "image": image,
+            }
+        )
+
+    return animes
+
+
+ongoing_anime_only = parser.only("div", "venz", "pagination")
+
+
+def ongoing_anime(html: str, page: int) -> dict:
+    if parser.use_lexbor(source):
+        return ongoing_anime_lexbor(html, page)
+
+    soup = parser.soup(html, source, ongoing_anime_only)
+
+    animes = []
+
+    animes_section = soup.find("div", class_="venz")
+
+    for anime in animes_section.find_all("li"):
+        id = anime.find("a")["href"].split("/")[-2]
+        title = anime.find("h2", class_="jdlflm").text
+        try:
+            episodes = int(anime.find("div", class_="epz").text.split(" ")[2])
+        except (AttributeError, IndexError, ValueError):
+            episodes = None
+        image = anime.find("img")["src"]
+        animes.append(
+            {
+                "id": id,
+                "title": title,
+                "episodes": episodes,
+                "image": image,
+            }
+        )
+
+    pagination = soup.find("div", class_="pagination")
+    has_next_page = pagination.find("a", class_="next page-numbers") is not None
+    has_prev_page = pagination.find("a", class_="prev page-numbers") is not None
+
+    return {
+        "animes": animes,
+        "pagination": {
+            "total_items": len(animes),
+            "current_page": page,
+            "has_next_page": has_next_page,
+            "has_prev_page": has_prev_page,
+        },
+    }
+
+
+def ongoing_anime_lexbor(html: str, page: int) -> dict:
+    tree = parser.tree(html)
+
+    animes = []
+
+    for anime in tree.css_first("div.venz").css("li"):
+        id = anime.css_first("a").attributes["href"].split("/")[-2]
+        title = anime.css_first("h2.jdlflm").text()
+        try:
+            episodes = int(anime.css_first("div.epz").text().split(" ")[2])
+        except (AttributeError, IndexError, ValueError):
+            episodes = None
+        image = anime.css_first("img").attributes["src"]
+        animes.append(
+            {
+                "id": id,
+                "title": title,
+                "episodes": episodes,
+                "image": image,
+            }
+        )
+
+    pagination = tree.css_first("div.pagination")
+    has_next_page = pagination.css_first("a.next.page-numbers") is not None
+    has_prev_page = pagination.css_first("a.prev.page-numbers") is not None
+
+    return {
+        "animes": animes,
+        "pagination": {
+            "total_items": len(animes),
+            "current_page": page,
+            "has_next_page": has_next_page,
+            "has_prev_page": has_prev_page,
+        },
+    }
+
+
+get_genres_only = parser.only("ul", "genres")
+
+
+def get_genres(html: str) -> list[dict]:
+    soup = parser.soup(html, source, get_genres_only)
+
+    genres = []
+
+    genres_section = soup.find("ul", class_="genres").find("li")
+
+    for genre in genres_section.find_all("a"):
+        id = genre["href"].split("/")[-2]
+        name = genre.text.strip()
+        genres.append(
+            {
+                "id": id,
+                "name": name,
+            }
+        )
+
+    return genres
+
+
+get_genres_anime_only = parser.only("div", "col-anime", "pagination")
+
+
+def get_genres_anime(html: str, page: int) -> dict:
+    if parser.use_lexbor(source):
+        return get_genres_anime_lexbor(html, page)
+
+    soup = parser.soup(html, source, get_genres_anime_only)
+
+    animes = []
+
+    for anime in soup.find_all("div", class_="col-anime"):
+        id = (
+            anime.find("div", class_="col-anime-title").find("a")["href"].split("/")[-2]
+        )
+        title = anime.find("div", class_="col-anime-title").find("a").text
+        image = anime.find("img")["src"]
+        animes.append(
+            {
+                "id": id,
+                "title": title,
+                "episodes": None,
+                "image": image,
+            }
+        )
+
+    pagination = soup.find("div", class_="pagination")
+    has_next_page = pagination.find("a", class_="next page-numbers") is not None
+    has_prev_page = pagination.find("a", class_="prev page-numbers") is not None
+
+    return {
+        "animes": animes,
+        "pagination": {
+            "total_items": len(animes),
+            "current_page": page,
+            "has_next_page": has_next_page,
+            "has_prev_page": has_prev_page,
+        },
+    }
+
+
+def get_genres_anime_lexbor(html: str, page: int) -> dict:
+    tree = parser.tree(html)
+
+    animes = []
+
+    for anime in tree.css("div.col-anime"):
+        link = anime.css_first("div.col-anime-title").css_first("a")
+        id = link.attributes["href"].split("/")[-2]
+        title = link.text()
+        image = anime.css_first("img").attributes["src"]
+        animes.append(
+            {
+                "id": id,
+                "title": title,
+                "episodes": None,
+                "image": image,
+            }
+        )
+
+    pagination = tree.css_first("div.pagination")
+    has_next_page = pagination.css_first("a.next.page-numbers") is not None
+    has_prev_page = pagination.css_first("a.prev.page-numbers") is not None
+
+    return {
+        "animes": animes,
+        "pagination": {
+            "total_items": len(animes),
+            "current_page": page,
+            "has_next_page": has_next_page,
+            "has_prev_page": has_prev_page,
+        },
+    }
+
+
+def get_anime(html: str, id: str) -> dict:
+    soup = parser.soup(html, source)
+
+    info_section = soup.find("div", class_="infozingle")
+
+    title = info_section.find("b", text="Judul").parent.text.split(":")[1].strip()
+
+    japanese_title = (
+        info_section.find("b", text="Japanese").parent.text.split(":")[1].strip()
+    )
+
+    description = soup.find("div", class_="sinopc").text.strip()
+
+    image = soup.find("div", class_="fotoanime").find("img")["src"]
+
+    score = info_section.find("b", text="Skor").parent.text.split(":")[1].strip()
+
+    producers = (
+        info_section.find("b", text="Produser")
+        .parent.text.strip()
+        .split(":")[1]
+        .split(", ")
+    )
+
+    type = info_section.find("b", text="Tipe").parent.text.split(":")[1].strip()
+
+    status = info_section.find("b", text="Status").parent.text.split(":")[1].strip()
+
+    total_episodes = (
+        info_section.find("b", text="Total Episode").parent.text.split(":")[1].strip()
+    )
+
+    duration = info_section.find("b", text="Durasi").parent.text.split(":")[1].strip()
+
+    release_date = (
+        info_section.find("b", text="Tanggal Rilis").parent.text.split(":")[1].strip()
+    )
+
+    studio = info_section.find("b", text="Studio").parent.text.split(":")[1].strip()
+
+    genres = []
+
+    genres_section = info_section.find("b", text="Genre").parent
+
+    for genre in genres_section.find_all("a"):
+        genre_id = genre["href"].split("/")[-2]
+        genre_name = genre.text.strip()
+        genres.append({"id": genre_id, "name": genre_name})
+
+    episodes = []
+
+    episodes_section = soup.find_all("div", class_="episodelist")
+    episodes_section = episodes_section[1]
+
+    for episode in episodes_section.find("ul").find_all("li"):
+        episode_id = episode.find("a")["href"].split("/")[-2]
+        # Extract the episode number after the word "episode"
+        episode_title = episode.find("a").text.strip().lower()
+        match = re.search(r"\bepisode\s+(\d+)\b", episode_title, re.IGNORECASE)
+
+        # If a match is found, extract the episode number; otherwise, use the full title
+        episode_number = match.group(1) if match else episode_title
+        episodes.append({"id": episode_id, "title": episode_number})
+
+    recommendations = []
+
+    recommendations_section = soup.find("div", id="recommend-anime-series")
+
+    for recommendation in recommendations_section.find_all("div", class_="isi-konten"):
+        recommendation_id = recommendation.find("a")["href"].split("/")[-2]
+        recommendation_title = recommendation.find(
+            "span", class_="judul-anime"
+        ).text.strip()
+        recommendation_image = recommendation.find("img")["src"]
+        recommendations.append(
+            {
+                "id": recommendation_id,
+                "title": recommendation_title,
+                "episodes": None,
+                "image": recommendation_image,
+            }
+        )
+
+    return {
+        "id": id,
+        "title": title,
+        "japanese_title": japanese_title,
+        "description": description,
+        "image": image,
+        "score": score,
+        "type": type,
+        "status": status,
+        "total_episodes": total_episodes,
+        "duration": duration,
+        "release_date": release_date,
+        "season": None,
+        "producers": producers,
+        "studio": studio,
+        "genres": genres,
+        "episodes": episodes,
+        "recommendations": recommendations,
+    }
+
+
+def get_episode(html: bytes, id: str, episode_id: str) -> dict:
+    soup = parser.soup(html, source)
+
+    title = soup.find("h1", class_="posttl").text.strip()
+
+    default_stream_url = soup.find("div", class_="responsive-embed-stream").find(
+        "iframe"
+    )["src"]
+
+    quality = {}
+
+    servers_section = soup.find("div", class_="mirrorstream")
+
+    qualities = servers_section.find_all("ul")
+    for quality_section in qualities:
+        quality_name = quality_section.get("class")[0].replace("m", "")
+        servers = []
+        for server in quality_section.find_all("li"):
+            server_id = server.find("a")["data-content"]
+            server_name = server.text.strip().lower()
+
+            servers.append(
+                {
+                    "id": server_id,
+                    "name": server_name,
+                }
+            )
+        quality[quality_name] = servers
+
+    download_servers = {}
+
+    downloads_section = soup.find("div", class_="download")
+
+    for download in downloads_section.find_all("li"):
+        quality_name = download.find("strong").text.strip()
+        servers = []
+        for server in download.find_all("a"):
+            server_name = server.text.strip().lower()
+            server_url = server["href"]
+
+            servers.append(
+                {
+                    "name": server_name,
+                    "url": server_url,
+                }
+            )
+        download_servers[quality_name] = servers
+
+    return {
+        "id": id,
+        "episode_id": episode_id,
+        "title": title,
+        "default_stream_url": default_stream_url,
+        "servers": quality,
+        "downloads": download_servers,
+    }
+
+
+def get_server(data: str) -> str:
+    html = base64.b64decode(data).decode("utf-8")
+    soup = parser.soup(html, source)
+
+    return soup.find("iframe")["src"]
@@ -0,0 +1,507 @@
+import base64
+import json
+
+from app.core import parser
+
+source = "samehadaku"
+
+
+search_only = parser.only("main", "site-main")
+
+
+def search(html: bytes) -> list[dict]:
+    if parser.use_lexbor(source):
+        return search_lexbor(html)
+
+    soup = parser.soup(html, source, search_only)
+
+    animes = []
+
+    animes_section = soup.find("main", class_="site-main relat")
+
+    for anime in animes_section.find_all("div", class_="animepost"):
+        id = anime.find("a")["href"].split("/")[-2]
+        title = anime.find("h2").text.strip()
+        try:
+            image = anime.find("img")["src"]
+        except:
+            image = "https://placehold.co/400"
+        animes.append(
+            {
+                "id": id,
+                "title": title,
+                "episodes": None,
+                "image": image,
+            }
+        )
+
+    return animes
+
+
+def search_lexbor(html: bytes) -> list[dict]:
+    tree = parser.tree(html)
+
+    animes = []
+
+    for anime in tree.css_first("main.site-main.relat").css("div.animepost"):
+        id = anime.css_first("a").attributes["href"].split("/")[-2]
+        title = anime.css_first("h2").text().strip()
+        try:
+            image = anime.css_first("img").attributes["src"]
+        except:
+            image = "https://placehold.co/400"
+        animes.append(
+            {
+                "id": id,
+                "title": title,
+                "episodes": None,
+                "image": image,
+            }
+        )
+
+    return animes
+
+
+ongoing_only = parser.only("div", "post-show", "pagination")
+
+
+def ongoing(html: bytes, page: int) -> dict:
+    if parser.use_lexbor(source):
+        return ongoing_lexbor(html, page)
+
+    soup = parser.soup(html, source, ongoing_only)
+
+    animes = []
+
+    animes_section = soup.find("div", class_="post-show").find("ul")
+
+    for anime in animes_section.find_all("li"):
+        id = anime.find("a")["href"].split("/")[-2]
+        try:
+            episodes = int(anime.find("span").find("author").text.strip())
+        except (AttributeError, IndexError, ValueError):
+            episodes = None
+        title = anime.find("h2").text.strip()
+        try:
+            image = anime.find("img")["src"]
+        except:
+            image = "https://placehold.co/400"
+        animes.append(
+            {
+                "id": id,
+                "title": title,
+                "episodes": episodes,
+                "image": image,
+            }
+        )
+
+    pagination = soup.find("div", class_="pagination")
+    current_page = pagination.find("span", class_="page-numbers current")
+    has_next_page = current_page.find_next_sibling("a") is not None
+    has_prev_page = current_page.find_previous_sibling("a") is not None
+
+    return {
+        "animes": animes,
+        "pagination": {
+            "total_items": len(animes),
+            "current_page": page,
+            "has_next_page": has_next_page,
+            "has_prev_page": has_prev_page,
+        },
+    }
+
+
+def ongoing_lexbor(html: bytes, page: int) -> dict:
+    tree = parser.tree(html)
+
+    animes = []
+
+    for anime in tree.css_first("div.post-show").css_first("ul").css("li"):
+        id = anime.css_first("a").attributes["href"].split("/")[-2]
+        try:
+            episodes = int(anime.css_first("span").css_first("author").text().strip())
+        except (AttributeError, IndexError, ValueError):
+            episodes = None
+        title = anime.css_first("h2").text().strip()
+        try:
+            image = anime.css_first("img").attributes["src"]
+        except:
+            image = "https://placehold.co/400"
+        animes.append(
+            {
+                "id": id,
+                "title": title,
+                "episodes": episodes,
+                "image": image,
+            }
+        )
+
+    pagination = tree.css_first("div.pagination")
+    current_page = pagination.css_first("span.page-numbers.current")
+    has_next_page = parser.next_sibling(current_page, "a") is not None
+    has_prev_page = parser.previous_sibling(current_page, "a") is not None
+
+    return {
+        "animes": animes,
+        "pagination": {
+            "total_items": len(animes),
+            "current_page": page,
+            "has_next_page": has_next_page,
+            "has_prev_page": has_prev_page,
+        },
+    }
+
+
+genres_only = parser.only("td", "genres")
+
+
+def genres(html: str) -> list[dict]:
+    soup = parser.soup(html, source, genres_only)
+
+    genres = []
+
+    genres_section = soup.find("td", class_="filter_act genres")
+
+    for genre in genres_section.find_all("label", class_="tax_fil"):
+        id = genre.find("input")["value"]
+        name = genre.text.strip()
+        genres.append(
+            {
+                "id": id,
+                "name": name,
+            }
+        )
+
+    return genres
+
+
+genres_anime_only = parser.only("div", "relat", "pagination")
+
+
+def genres_anime(html: str, page: int) -> dict:
+    if parser.use_lexbor(source):
+        return genres_anime_lexbor(html, page)
+
+    soup = parser.soup(html, source, genres_anime_only)
+
+    animes = []
+
+    animes_section = soup.find("div", class_="relat")
+
+    for anime in animes_section.find_all("div", class_="animepost"):
+        id = anime.find("a")["href"].split("/")[-2]
+        title = anime.find("h2").text.strip()
+        try:
+            image = anime.find("img")["src"]
+        except:
+            image = "https://placehold.co/400"
+        animes.append(
+            {
+                "id": id,
+                "title": title,
+                "episodes": None,
+                "image": image,
+            }
+        )
+
+    pagination = soup.find("div", class_="pagination")
+    current_page = pagination.find("span", class_="page-numbers current")
+    has_next_page = current_page.find_next_sibling("a") is not None
+    has_prev_page = current_page.find_previous_sibling("a") is not None
+
+    return {
+        "animes": animes,
+        "pagination": {
+            "total_items": len(animes),
+            "current_page": page,
+            "has_next_page": has_next_page,
+            "has_prev_page": has_prev_page,
+        },
+    }
+
+
+def genres_anime_lexbor(html: str, page: int) -> dict:
+    tree = parser.tree(html)
+
+    animes = []
+
+    for anime in tree.css_first("div.relat").css("div.animepost"):
+        id = anime.css_first("a").attributes["href"].split("/")[-2]
+        title = anime.css_first("h2").text().strip()
+        try:
+            image = anime.css_first("img").attributes["src"]
+        except:
+            image = "https://placehold.co/400"
+        animes.append(
+            {
+                "id": id,
+                "title": title,
+                "episodes": None,
+                "image": image,
+            }
+        )
+
+    pagination = tree.css_first("div.pagination")
+    current_page = pagination.css_first("span.page-numbers.current")
+    has_next_page = parser.next_sibling(current_page, "a") is not None
+    has_prev_page = parser.previous_sibling(current_page, "a") is not None
+
+    return {
+        "animes": animes,
+        "pagination": {
+            "total_items": len(animes),
+            "current_page": page,
+            "has_next_page": has_next_page,
+            "has_prev_page": has_prev_page,
+        },
+    }
+
+
+def get_anime(html: str, id: str) -> dict:
+    soup = parser.soup(html, source)
+
+    title = (
+        soup.find("h3", class_="anim-detail")
+        .text.strip()
+        .replace("Detail Anime ", "")
+        .strip()
+    )
+
+    info_section = soup.find("div", class_="spe")
+
+    japanese_title = (
+        soup.find("b", text="Japanese")
+        .parent.text.strip()
+        .replace("Japanese", "")
+        .strip()
+    )
+
+    description = (
+        soup.find("div", class_="infox").find("div", class_="desc").text.strip()
+    )
+
+    try:
+        image = soup.find("div", class_="thumb").find("img")["src"]
+    except:
+        image = "https://placehold.co/400"
+
+    try:
+        score = soup.find("span", attrs={"itemprop": "ratingValue"}).text.strip()
+    except:
+        score = "0"
+
+    producers = (
+        info_section.find("b", text="Producers")
+        .parent.text.strip()
+        .replace("Producers", "")
+        .strip()
+        .split(", ")
+    )
+
+    type = (
+        info_section.find("b", text="Type")
+        .parent.text.strip()
+        .replace("Type", "")
+        .strip()
+    )
+
+    status = (
+        info_section.find("b", text="Status")
+        .parent.text.strip()
+        .replace("Status", "")
+        .strip()
+    )
+
+    total_episodes = (
+        info_section.find("b", text="Total Episode")
+        .parent.text.strip()
+        .replace("Total Episode", "")
+        .strip()
+        or "1"
+    )
+
+    duration = (
+        info_section.find("b", text="Duration")
+        .parent.text.strip()
+        .replace("Duration", "")
+        .strip()
+        or "0 m"
+    )
+
+    release_date = (
+        info_section.find("b", text="Released:")
+        .parent.text.strip()
+        .replace("Released:", "")
+        .strip()
+    )
+
+    season = (
+        info_section.find("b", text="Season")
+        .parent.text.strip()
+        .replace("Season", "")
+        .strip()
+    )
+
+    studio = (
+        info_section.find("b", text="Studio")
+        .parent.text.strip()
+        .replace("Studio", "")
+        .strip()
+    )
+
+    genres = []
+
+    genres_section = soup.find("div", class_="genre-info")
+
+    for genre in genres_section.find_all("a"):
+        genre_id = genre["href"].split("/")[-1]
+        genre_name = genre.text.strip()
+        genres.append({"id": genre_id, "name": genre_name})
+
+    episodes = []
+
+    episodes_section = soup.find("div", class_="lstepsiode listeps").find("ul")
+
+    for episode in episodes_section.find_all("li"):
+        episode_id = episode.find("a")["href"].split("/")[-2]
+        episode_title = episode.find("div", class_="epsright").text.strip()
+        episodes.append({"id": episode_id, "title": episode_title})
+
+    recommendations = []
+
+    recommendations_section = soup.find("div", class_="rand-animesu").find("ul")
+
+    for recommendation in recommendations_section.find_all("li"):
+        recommendation_id = recommendation.find("a")["href"].split("/")[-2]
+        recommendation_title = recommendation.find("span", class_="judul").text.strip()
+        try:
+            recommendation_image = recommendation.find("img")["src"]
+        except:
+            recommendation_image = "https://placehold.co/400"
+        recommendations.append(
+            {
+                "id": recommendation_id,
+                "title": recommendation_title,
+                "episodes": None,
+                "image": recommendation_image,
+            }
+        )
+
+    return {
+        "id": id,
+        "title": title,
+        "japanese_title": japanese_title,
+        "description": description,
+        "image": image,
+        "score": score,
+        "type": type,
+        "status": status,
+        "total_episodes": total_episodes,
+        "duration": duration,
+        "release_date": release_date,
+        "season": season,
+        "producers": producers,
+        "studio": studio,
+        "genres": genres,
+        "episodes": episodes,
+        "recommendations": recommendations,
+    }
+
+
+get_episode_servers_only = parser.only(
+    ["h1", "div"], "entry-title", "east_player_option"
+)
+
+
+def get_episode_servers(html: bytes) -> dict:
+    soup = parser.soup(html, source, get_episode_servers_only)
+
+    title = soup.find("h1", class_="entry-title").text.strip()
+
+    # Initialize the result dictionary
+    quality = {}
+
+    # Iterate through each server option
+    for server in soup.find_all("div", class_="east_player_option"):
+        server_post_id = server.get("data-post")
+        server_nume = server.get("data-nume")
+        server_type = server.get("data-type")
+
+        server_id = base64.b64encode(
+            json.dumps(
+                {
+                    "post": server_post_id,
+                    "nume": server_nume,
+                    "type": server_type,
+                }
+            ).encode("utf-8")
+        ).decode("utf-8")
+
+        # Extract the text inside the <span> tag
+        server_text = server.find("span").text.strip()
+
+        # Split the text into server name and quality
+        parts = server_text.split()
+        server_name = " ".join(parts[:-1])  # Everything except the last part
+        quality_value = parts[-1]  # The last part is the quality
+
+        # Check if the server is disabled
+        is_disabled = "pointer-events: none" in server.get(
+            "style", ""
+        ) or "text-decoration: line-through" in server.find("span").get("style", "")
+
+        # Skip disabled options
+        if is_disabled:
+            continue
+
+        # Initialize the quality key as a list if it doesn't exist
+        if quality_value not in quality:
+            quality[quality_value] = []
+
+        # Append the server to the list
+        quality[quality_value].append(
+            {
+                "id": server_id,
+                "name": server_name,
+            }
+        )
+
+    return {
+        "title": title,
+        "servers": quality,
+    }
+
+
+get_episode_downloads_only = parser.only("div", "download-eps")
+
+
+def get_episode_downloads(html: bytes) -> dict:
+    soup = parser.soup(html, source, get_episode_downloads_only)
+
+    download_servers = {}
+
+    format_section = soup.find_all("div", class_="download-eps")
+
+    for format in format_section:
+        for download in format.find_all("li"):
+            quality_name = download.find("strong").text.strip()
+            servers = []
+            for server in download.find_all("a"):
+                server_name = server.text.strip().lower()
+                server_url = server["href"]
+
+                servers.append(
+                    {
+                        "name": server_name,
+                        "url": server_url,
+                    }
+                )
+            download_servers[quality_name] = servers
+
+    return download_servers
+
+
+def get_server(html: str) -> str:
+    soup = parser.soup(html, source)
+
+    return soup.find("iframe")["src"]
@@ -0,0 +1,102 @@
+"""Keep the hot routes cached before anyone asks for them.
+
+Every WARM_INTERVAL seconds (with jitter) each job reloads its entry when it
+is missing or turns stale within WARM_REFRESH_AHEAD seconds, at most
+WARM_CONCURRENCY_PER_HOST jobs per upstream at a time. It runs inside the
+app with WARMER_ENABLED=true, or on its own next to the api workers:
+
+    python -m app.warmer
+"""
+
+import asyncio
+import logging
+import random
+from collections import defaultdict
+from collections.abc import Awaitable, Callable
+from functools import partial
+
+from app import config
+from app.core import backends, executor, upstream
+from app.routers import manga, news
+from app.routers.anime import otakudesu, samehadaku
+
+logger = logging.getLogger(__name__)
+
+
+def jobs() -> list[tuple[str, str, Callable[[int], Awaitable]]]:
+    """(upstream host, name, job), every job takes the refresh-ahead seconds."""
+    pages = range(1, config.WARM_ONGOING_PAGES + 1)
+
+    return [
+        *(
+            (
+                "otakudesu.cloud",
+                f"otakudesu ongoing {page}",
+                partial(otakudesu.ongoing_anime.warm, page=page),
+            )
+            for page in pages
+        ),
+        *(
+            (
+                "samehadaku.mba",
+                f"samehadaku ongoing {page}",
+                partial(samehadaku.ongoing.warm, page=page),
+            )
+            for page in pages
+        ),
+        ("otakudesu.cloud", "otakudesu genres", otakudesu.get_genres.warm),
+        ("samehadaku.mba", "samehadaku genres", samehadaku.genres.warm),
+        ("komiku.id", "manga genres", manga.get_genres.warm),
+        *(
+            (
+                "samehadaku.mba",
+                f"samehadaku schedule {day}",
+                partial(samehadaku.schedule_day.warm, day=day),
+            )
+            for day in samehadaku.days
+        ),
+        (
+            "api.komiku.id",
+            "manga recent",
+            partial(manga.get_recent_update.warm, page=1),
+        ),
+        ("api.komiku.id", "manga popular", partial(manga.get_popular.warm, page=1)),
+        ("www.animenewsnetwork.com", "news recent", news.get_recent_news.warm),
+    ]
+
+
+async def warm(name: str, job, limit: asyncio.Semaphore) -> None:
+    # spread the jobs so every upstream is not hit at the same instant
+    await asyncio.sleep(random.uniform(0, config.WARM_JITTER))
+    async with limit:
+        try:
+            await job(ahead=config.WARM_REFRESH_AHEAD)
+        except Exception:
+            logger.warning("Error warming %s", name, exc_info=True)
+
+
+async def run() -> None:
+    limits = defaultdict(lambda: asyncio.Semaphore(config.WARM_CONCURRENCY_PER_HOST))
+
+    while True:
+        await asyncio.gather(
+            *(warm(name, job, limits[host]) for host, name, job in jobs())
+        )
+        await asyncio.sleep(config.WARM_INTERVAL * random.uniform(0.9, 1.1))
+
+
+async def main() -> None:
+    await upstream.startup()
+    await executor.startup()
+    await backends.startup()
+    try:
+        await run()
+    finally:
+        await backends.shutdown()
+        await executor.shutdown()
+        await upstream.shutdown()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+"""Encode/decode time and stored size of cached detail responses per coder.
+
+Payloads are the models the detail routes cache for long running shows and
+manga (hundreds of episodes or chapters). With ``--redis`` every value is
+also written to that server and MEMORY USAGE is reported, without it the
+size column is the value length only.
+
+    python -m benchmarks.cache_coder --number 200
+    python -m benchmarks.cache_coder --redis redis://localhost
+"""
+
+import argparse
+import asyncio
+import time
+from collections.abc import Callable
+
+from fastapi_cache.coder import Coder, JsonCoder
+
+from app import config
+from app.core import coder
+from app.core.coder import CompactCoder
+from app.models.anime import AnimeDetail
+from app.models.manga import MangaDetail
+from app.scrapers import komiku, otakudesu
+from benchmarks import pages
+
+
+def payloads(size: int) -> dict[str, object]:
+    anime = otakudesu.get_anime(pages.otakudesu_anime(size), "solo")
+    manga = komiku.get_manga(pages.komiku_manga(size).encode(), "solo")
+    return {
+        f"anime_{size}_episodes": AnimeDetail(**anime),
+        f"manga_{size}_chapters": MangaDetail(**manga),
+    }
+
+
+def variants() -> dict[str, tuple[type[Coder], str]]:
+    found = {
+        "json": (JsonCoder, "none"),
+        "orjson": (CompactCoder, "none"),
+        "orjson+zlib": (CompactCoder, "zlib"),
+    }
+    if coder.zstandard is not None:
+        found["orjson+zstd"] = (CompactCoder, "zstd")
+    return found
+
+
+def timed(function: Callable, number: int) -> float:
+    started = time.perf_counter()
+    for _ in range(number):
+        function()
+    return (time.perf_counter() - started) / number * 1000
+
+
+async def memory_usage(url: str, values: dict[str, bytes]) -> dict[str, int]:
+    from redis import asyncio as aioredis
+
+    redis = aioredis.from_url(url)
+    usage = {}
+    for name, value in values.items():
+        key = "benchmark:cache_coder:" + name
+        await redis.set(key, value)
+        usage[name] = await redis.memory_usage(key)
+        await redis.delete(key)
+    await redis.aclose()
+    return usage
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--redis", help="redis url to measure MEMORY USAGE on")
+    args = parser.parse_args()
+
+    print(
+        f"{'payload':<22} {'coder':<12} {'encode (ms)':>12} {'decode (ms)':>12}"
+        f" {'bytes':>10} {'redis':>10}"
+    )
+    for size in args.sizes:
+        for payload, value in payloads(size).items():
+            rows = {}
+            for name, (coder_class, compression) in variants().items():
+                config.CACHE_COMPRESSION = compression
+                encoded = coder_class.encode(value)
+                assert coder_class.decode(encoded) == JsonCoder.decode(
+                    JsonCoder.encode(value)
+                )
+                rows[name] = (
+                    timed(lambda: coder_class.encode(value), args.number),
+                    timed(lambda: coder_class.decode(encoded), args.number),
+                    encoded,
+                )
+
+            usage = {}
+            if args.redis:
+                usage = asyncio.run(
+                    memory_usage(
+                        args.redis, {name: row[2] for name, row in rows.items()}
+                    )
+                )
+
+            for name, (encode, decode, encoded) in rows.items():
+                print(
+                    f"{payload:<22} {name:<12} {encode:>12.3f} {decode:>12.3f}"
+                    f" {len(encoded):>10} {usage.get(name, '-'):>10}"
+                )
+
+
+if __name__ == "__main__":
+    main()
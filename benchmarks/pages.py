@@ -0,0 +1,129 @@
+"""Synthetic upstream pages shaped like the markup the scrapers expect.
+
+They are only meant for benchmarks, real pages captured with
+``python -m benchmarks.parsers --capture`` give more representative numbers.
+"""
+
+otakudesu_url = "https://otakudesu.cloud"
+komiku_url = "https://komiku.id"
+
+
+def page(body: str) -> str:
+    # pad every page with the kind of chrome the real sites have around the
+    # content we extract (navigation, sidebars, scripts)
+    nav = "".join(f"<li><a href='/menu/{i}/'>Menu {i}</a></li>" for i in range(60))
+    sidebar = "".join(
+        f"<div class='widget'><a href='/side/{i}/'><img src='/s/{i}.jpg'/>"
+        f"<span>Sidebar item {i}</span></a></div>"
+        for i in range(80)
+    )
+    script = "<script>" + "var x = 1;" * 500 + "</script>"
+    return (
+        f"<html><head><title>page</title>{script}</head><body>"
+        f"<div class='header'><ul>{nav}</ul></div>{body}"
+        f"<div class='sidebar'>{sidebar}</div><div class='footer'>footer</div>"
+        "</body></html>"
+    )
+
+
+def otakudesu_ongoing(items: int = 25) -> str:
+    animes = "".join(
+        f"<li><div class='detpost'><div class='epz'><i></i> Episode {i}</div>"
+        f"<div class='thumb'><a href='{otakudesu_url}/anime/anime-{i}-sub-indo/'>"
+        f"<div class='thumbz'><img src='{otakudesu_url}/img/{i}.jpg'/>"
+        f"<h2 class='jdlflm'>Anime {i}</h2></div></a></div></div></li>"
+        for i in range(items)
+    )
+    return page(
+        f"<div class='venz'><ul>{animes}</ul></div>"
+        "<div class='pagination'><a class='next page-numbers' href='#'>next</a></div>"
+    )
+
+
+def otakudesu_search(items: int = 20) -> str:
+    animes = "".join(
+        f"<li><img src='{otakudesu_url}/s/{i}.jpg'/><h2>"
+        f"<a href='{otakudesu_url}/anime/search-{i}-sub-indo/'>"
+        f"Search {i} (2024) Subtitle Indonesia</a></h2></li>"
+        for i in range(items)
+    )
+    return page(f"<ul class='chivsrc'>{animes}</ul>")
+
+
+def otakudesu_anime(episodes: int = 500) -> str:
+    info = "".join(
+        f"<p><span><b>{key}</b>: {value}</span></p>"
+        for key, value in [
+            ("Judul", "Solo Leveling"),
+            ("Japanese", "Ore dake Level Up na Ken"),
+            ("Skor", "8.5"),
+            ("Produser", "Aniplex, Crunchyroll"),
+            ("Tipe", "TV"),
+            ("Status", "Ongoing"),
+            ("Total Episode", "12"),
+            ("Durasi", "24 Menit"),
+            ("Tanggal Rilis", "Jan 05, 2025"),
+            ("Studio", "A-1 Pictures"),
+        ]
+    )
+    info += (
+        f"<p><span><b>Genre</b>: <a href='{otakudesu_url}/genres/action/'>Action</a>, "
+        f"<a href='{otakudesu_url}/genres/fantasy/'>Fantasy</a></span></p>"
+    )
+    episode_list = "".join(
+        f"<li><span><a href='{otakudesu_url}/episode/solo-episode-{i}-sub-indo/'>"
+        f"Solo Leveling Episode {i} Subtitle Indonesia</a></span>"
+        "<span class='zeebr'>5 Jan,25</span></li>"
+        for i in range(episodes)
+    )
+    recommendations = "".join(
+        f"<div class='isi-konten'><div class='isi-anime'>"
+        f"<a href='{otakudesu_url}/anime/rec-{i}/'><img src='{otakudesu_url}/r/{i}.jpg'/></a>"
+        f"<span class='judul-anime'><a href='#'>Recommendation {i}</a></span></div></div>"
+        for i in range(10)
+    )
+    return page(
+        f"<div class='fotoanime'><img src='{otakudesu_url}/cover.jpg'/>"
+        f"<div class='infozingle'>{info}</div>"
+        "<div class='sinopc'><p>" + "Synopsis. " * 100 + "</p></div></div>"
+        "<div class='episodelist'><ul><li>Batch</li></ul></div>"
+        f"<div class='episodelist'><ul>{episode_list}</ul></div>"
+        f"<div id='recommend-anime-series'>{recommendations}</div>"
+    )
+
+
+def komiku_mangas(items: int = 30) -> str:
+    mangas = "".join(
+        f"<div class='bge'><div class='bgei'><a href='{komiku_url}/manga/manga-{i}/'>"
+        f"<img src='{komiku_url}/m/{i}.jpg?w=225'/></a>"
+        "<div class='tpe1_inf'><b>Manhwa</b> Fantasy</div></div>"
+        f"<div class='kan'><a href='#'><h3>Manga {i}</h3></a><p>Description {i}</p>"
+        "</div></div>"
+        for i in range(items)
+    )
+    return page(f"<div class='daftar'>{mangas}</div>")
+
+
+def komiku_manga(chapters: int = 500) -> str:
+    chapter_rows = "".join(
+        f"<tr><td class='judulseries'><a href='{komiku_url}/manga-chapter-{i}/'>"
+        f"Chapter {i}</a></td><td class='tanggalseries'>01/01/2024</td></tr>"
+        for i in range(chapters)
+    )
+    recommendations = "".join(
+        f"<div class='grd'><a href='{komiku_url}/manga/rec-{i}/'>"
+        f"<img data-src='{komiku_url}/r/{i}.jpg?w=1'/></a>"
+        "<div class='tpe1_inf'><b>Manga</b> Action</div>"
+        f"<div class='h4'>Recommendation {i}</div><p>Description</p></div>"
+        for i in range(10)
+    )
+    return page(
+        f"<section id='Informasi'><img src='{komiku_url}/cover.jpg?w=1'/><table>"
+        "<tr><td>Judul Komik</td><td>Solo Leveling</td></tr>"
+        "<tr><td>Pengarang</td><td>Chugong</td></tr>"
+        "<tr><td>Status</td><td>Ongoing</td></tr></table>"
+        f"<ul class='genre'><li><a href='{komiku_url}/genre/action/'>Action</a></li>"
+        "</ul></section><p class='desc'>Description</p>"
+        f"<table id='Daftar_Chapter'><tr><th>Chapter</th></tr>{chapter_rows}</table>"
+        f"<section id='Spoiler'>{recommendations}</section>"
+    )
@@ -0,0 +1,80 @@
+"""Concurrent throughput of detail endpoints with and without the parse pool.
+
+Every simulated request waits for a fake upstream round trip and then parses
+a large detail page. Inline parsing serializes all requests on the event loop,
+the pool lets the loop keep serving while workers parse.
+
+    python -m benchmarks.parse_executor --requests 200 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import time
+
+from app import config
+from app.core import executor
+from app.scrapers import komiku, otakudesu
+from benchmarks import pages
+
+
+async def monitor_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+async def run(requests: int, concurrency: int, latency: float) -> tuple[float, float]:
+    anime_page = pages.otakudesu_anime()
+    manga_page = pages.komiku_manga()
+    limit = asyncio.Semaphore(concurrency)
+
+    async def request(i: int) -> None:
+        async with limit:
+            await asyncio.sleep(latency)
+            if i % 2:
+                await executor.parse(otakudesu.get_anime, anime_page, "solo")
+            else:
+                await executor.parse(komiku.get_manga, manga_page.encode(), "solo")
+
+    await executor.startup()
+    # spawn the workers before timing
+    await asyncio.gather(
+        *(executor.parse(len, "warmup") for _ in range(max(config.PARSER_POOL_SIZE, 1)))
+    )
+
+    stop = asyncio.Event()
+    lag = asyncio.create_task(monitor_lag(stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(request(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    worst_lag = await lag
+
+    await executor.shutdown()
+    return requests / elapsed, worst_lag
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[0, 2, 4])
+    args = parser.parse_args()
+
+    print(f"{'pool':>6} {'req/s':>10} {'max loop lag (ms)':>20}")
+    for size in args.pool_sizes:
+        config.PARSER_POOL_SIZE = size
+        config.PARSER_MAX_PENDING = max(size * 8, 1)
+        throughput, lag = asyncio.run(
+            run(args.requests, args.concurrency, args.latency)
+        )
+        label = "inline" if size == 0 else str(size)
+        print(f"{label:>6} {throughput:>10.1f} {lag * 1000:>20.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Parse+extract time per endpoint for every parser backend.
+
+Listing extractors only materialize the subtrees they declare, so the peak
+memory column is the python heap held while extracting one page.
+
+Pages are read from benchmarks/fixtures/<endpoint>.html. Capture real ones
+with ``--capture``, endpoints without a fixture fall back to the synthetic
+pages in benchmarks.pages (or are skipped when there is none). Every backend
+must return exactly what html.parser returns.
+
+    python -m benchmarks.parsers --capture
+    python -m benchmarks.parsers --number 20
+"""
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+
+from app.core import parser, upstream
+from app.scrapers import animenewsnetwork, komiku, otakudesu, samehadaku
+from benchmarks import pages
+
+fixtures = Path(__file__).parent / "fixtures"
+
+# name: (source, extract, extra args, upstream url, synthetic page)
+endpoints: dict[str, tuple[str, Callable, tuple, str, Callable | None]] = {
+    "otakudesu_search": (
+        "otakudesu",
+        otakudesu.search,
+        (),
+        "https://otakudesu.cloud/?s=one&post_type=anime",
+        pages.otakudesu_search,
+    ),
+    "otakudesu_ongoing": (
+        "otakudesu",
+        otakudesu.ongoing_anime,
+        (1,),
+        "https://otakudesu.cloud/ongoing-anime/page/1",
+        pages.otakudesu_ongoing,
+    ),
+    "otakudesu_anime": (
+        "otakudesu",
+        otakudesu.get_anime,
+        ("one-piece-sub-indo",),
+        "https://otakudesu.cloud/anime/one-piece-sub-indo",
+        pages.otakudesu_anime,
+    ),
+    "samehadaku_ongoing": (
+        "samehadaku",
+        samehadaku.ongoing,
+        (1,),
+        "https://samehadaku.mba/anime-terbaru/page/1/",
+        None,
+    ),
+    "samehadaku_anime": (
+        "samehadaku",
+        samehadaku.get_anime,
+        ("one-piece",),
+        "https://samehadaku.mba/anime/one-piece/",
+        None,
+    ),
+    "komiku_recent": (
+        "komiku",
+        komiku.mangas,
+        (),
+        "https://api.komiku.id/manga/page/1/?orderby=modified",
+        pages.komiku_mangas,
+    ),
+    "komiku_manga": (
+        "komiku",
+        komiku.get_manga,
+        ("one-piece",),
+        "https://komiku.id/manga/one-piece/",
+        pages.komiku_manga,
+    ),
+    "news_recent": (
+        "animenewsnetwork",
+        animenewsnetwork.get_recent_news,
+        (),
+        "https://www.animenewsnetwork.com",
+        None,
+    ),
+}
+
+
+async def capture() -> None:
+    fixtures.mkdir(exist_ok=True)
+    await upstream.startup()
+    try:
+        for name, (_, _, _, url, _) in endpoints.items():
+            response = await upstream.get(url, follow_redirects=True)
+            (fixtures / f"{name}.html").write_bytes(response.content)
+            print(f"captured {name} ({len(response.content)} bytes)")
+    finally:
+        await upstream.shutdown()
+
+
+def load(name: str, synthetic: Callable | None) -> tuple[bytes, str] | None:
+    path = fixtures / f"{name}.html"
+    if path.exists():
+        return path.read_bytes(), "fixture"
+    if synthetic is not None:
+        return synthetic().encode(), "synthetic"
+    return None
+
+
+def measure(extract: Callable, html: bytes, args: tuple, number: int) -> float:
+    started = time.perf_counter()
+    for _ in range(number):
+        extract(html, *args)
+    return (time.perf_counter() - started) / number
+
+
+def peak_memory(extract: Callable, html: bytes, args: tuple) -> int:
+    tracemalloc.start()
+    try:
+        extract(html, *args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main() -> None:
+    arguments = argparse.ArgumentParser()
+    arguments.add_argument("--capture", action="store_true")
+    arguments.add_argument("--number", type=int, default=10)
+    arguments.add_argument(
+        "--backends",
+        nargs="+",
+        default=[parser.HTML_PARSER, parser.LXML, parser.LEXBOR],
+    )
+    args = arguments.parse_args()
+
+    if args.capture:
+        asyncio.run(capture())
+        return
+
+    print(
+        f"{'endpoint':<20} {'page':<10} {'backend':<12} {'ms':>8} {'speedup':>8} "
+        f"{'peak KiB':>9}"
+    )
+    for name, (source, extract, extra, _, synthetic) in endpoints.items():
+        page = load(name, synthetic)
+        if page is None:
+            continue
+        html, kind = page
+
+        parser.backends[source] = parser.HTML_PARSER
+        expected = extract(html, *extra)
+        baseline = None
+        for backend in args.backends:
+            parser.backends[source] = backend
+            if extract(html, *extra) != expected:
+                raise AssertionError(f"{backend} output differs for {name}")
+            elapsed = measure(extract, html, extra, args.number)
+            peak = peak_memory(extract, html, extra)
+            baseline = baseline or elapsed
+            print(
+                f"{name:<20} {kind:<10} {backend:<12} {elapsed * 1000:>8.2f} "
+                f"{baseline / elapsed:>7.1f}x {peak / 1024:>9.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()